@@ -0,0 +1,308 @@
+import os
+import sys
+import json
+import inspect
+import argparse
+import threading
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+import workers
+import crf_predict
+import fanout
+import trim
+import images
+from jobqueue import JobQueue
+from metrics import METRICS_LOG, run_measured, load_records, write_prometheus
+from scheduler import Scheduler
+
+# manifest: one job per line, either JSON
+#   {"type": "compress_fast", "input": "a.mkv", "size_mb": 25}
+# or a bare input path that takes its type and params from the command line
+
+JOB_TYPES = {
+    'convert': workers.convert,
+    'compress_precise': workers.compress_precise,
+    'compress_fast': workers.compress_fast,
+    'compress_crf': crf_predict.compress_crf,
+    'sound': workers.process_sound,
+    'fanout': fanout.fanout,
+    'trim': trim.trim,
+    'images': images.convert_images,
+}
+
+# jobs.sqlite rows this tool queued (see jobqueue.py)
+JOB_OWNER = 'batch'
+
+
+def _file_logger(log_path):
+    def write_log(text):
+        if not text.endswith('\n'):
+            text += '\n'
+        with open(log_path, 'a', encoding='utf-8') as fh:
+            fh.write(text)
+    return write_log
+
+
+def _queue_progress(queue, job_id):
+    def on_progress(event):
+        queue.put((job_id, event))
+    return on_progress
+
+
+def run_job(job, log_dir=None, progress_queue=None, job_id=None, metrics_path=None):
+    params = dict(job)
+    kind = params.pop('type')
+    input_path = params.pop('input')
+    func = JOB_TYPES.get(kind)
+    if func is None:
+        return {'type': kind, 'input': input_path, 'rc': 2, 'output': None, 'error': f"unknown job type: {kind}"}
+
+    use_cache = params.pop('use_cache', True)
+    # command-line defaults apply to every line, so drop the ones this job type doesn't take
+    accepted = inspect.signature(func).parameters
+    params = {k: v for k, v in params.items() if k in accepted}
+    if getattr(func, 'result_cache_kind', None):
+        params['use_cache'] = use_cache
+
+    write_log = None
+    if log_dir:
+        # scheduled jobs share one process, so name logs by job when there is an id
+        write_log = _file_logger(Path(log_dir) / f"{Path(input_path).name}.{os.getpid() if job_id is None else job_id}.log")
+    if progress_queue is not None and 'on_progress' in accepted:
+        params['on_progress'] = _queue_progress(progress_queue, job_id)
+    try:
+        (rc, out_path), rec = run_measured(kind, func, input_path, write_log=write_log, metrics_path=metrics_path, **params)
+    except Exception as e:
+        return {'type': kind, 'input': input_path, 'rc': 1, 'output': None, 'error': str(e)}
+    if isinstance(out_path, list):
+        output = [str(p) for p in out_path]
+    else:
+        output = str(out_path) if out_path else None
+    return {'type': kind, 'input': input_path, 'rc': rc, 'output': output, 'metrics': rec}
+
+
+def read_manifest(path, defaults):
+    jobs = []
+    with open(path, encoding='utf-8') as fh:
+        for line in fh:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                job = dict(defaults)
+                job.update(json.loads(line))
+            else:
+                job = dict(defaults, input=line)
+            if 'type' not in job:
+                raise ValueError(f"job has no type: {line}")
+            jobs.append(job)
+    return jobs
+
+
+def _pump_progress(queue, jobs, on_progress):
+    while True:
+        item = queue.get()
+        if item is None:
+            return
+        i, event = item
+        on_progress(jobs[i], event)
+
+
+def _start_progress(jobs, on_progress):
+    # child processes publish progress events, one thread here hands them to on_progress
+    manager = multiprocessing.Manager()
+    queue = manager.Queue()
+    pump = threading.Thread(target=_pump_progress, args=(queue, jobs, on_progress), daemon=True)
+    pump.start()
+    return manager, queue, pump
+
+
+def _stop_progress(manager, queue, pump):
+    queue.put(None)
+    pump.join()
+    manager.shutdown()
+
+
+def failed_result(job, error):
+    return {'type': job.get('type'), 'input': job.get('input'), 'rc': 1, 'output': None, 'error': error}
+
+
+def make_pool(max_workers, schedule):
+    # schedule: jobs run in threads of this process (ffmpeg does the work anyway),
+    # each on its own share of the cores, instead of one process per job
+    if schedule:
+        return Scheduler(cores=max_workers)
+    return ProcessPoolExecutor(max_workers=max_workers)
+
+
+def submit_job(pool, job, *args):
+    if isinstance(pool, Scheduler):
+        return pool.submit(run_job, job, *args, kind=job.get('type'), priority=job.get('priority'))
+    return pool.submit(run_job, job, *args)
+
+
+def run_batch(jobs, max_workers=None, log_dir=None, on_result=None, on_progress=None, schedule=False, metrics_path=None):
+    max_workers = max_workers or os.cpu_count() or 1
+    results = [None] * len(jobs)
+    progress = _start_progress(jobs, on_progress) if on_progress else None
+    try:
+        with make_pool(max_workers, schedule) as pool:
+            futures = {submit_job(pool, job, log_dir, progress and progress[1], i, metrics_path): i for i, job in enumerate(jobs)}
+            for fut in as_completed(futures):
+                i = futures[fut]
+                try:
+                    res = fut.result()
+                except Exception as e:
+                    res = failed_result(jobs[i], str(e))
+                results[i] = res
+                if on_result:
+                    on_result(res)
+    finally:
+        if progress:
+            _stop_progress(*progress)
+    return results
+
+
+def run_queue(queue, max_workers=None, log_dir=None, on_result=None, on_progress=None, schedule=False,
+              metrics_path=None, owner=JOB_OWNER):
+    # jobs are claimed one at a time as slots free up, so whatever is still
+    # 'queued' after a crash is exactly the work that never started
+    max_workers = max_workers or os.cpu_count() or 1
+    queue.recover(owner=owner)
+    claimed = {}
+    results = []
+    progress = _start_progress(claimed, on_progress) if on_progress else None
+    try:
+        with make_pool(max_workers, schedule) as pool:
+            running = {}
+            while True:
+                while pool.has_room() if schedule else len(running) < max_workers:
+                    item = queue.claim(owner=owner)
+                    if item is None:
+                        break
+                    job_id, job = item
+                    claimed[job_id] = job
+                    running[submit_job(pool, job, log_dir, progress and progress[1], job_id, metrics_path)] = job_id
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    job_id = running.pop(fut)
+                    try:
+                        res = fut.result()
+                    except Exception as e:
+                        res = failed_result(claimed[job_id], str(e))
+                    queue.finish(job_id, res['rc'], res['output'], res.get('error'))
+                    results.append(res)
+                    if on_result:
+                        on_result(res)
+    finally:
+        if progress:
+            _stop_progress(*progress)
+    return results
+
+
+def _defaults_from_args(args):
+    defaults = {}
+    if args.type:
+        defaults['type'] = args.type
+    for key in ('ext', 'size_mb', 'audio_kbit', 'speed', 'bass', 'treble', 'gain', 'bitrate', 'first_pass', 'start', 'end'):
+        val = getattr(args, key)
+        if val is not None:
+            defaults[key] = val
+    if args.segmented:
+        defaults['segmented'] = True
+    if args.normalize:
+        defaults['normalize'] = True
+    if args.no_scale:
+        defaults['auto_scale'] = False
+    if args.no_cache:
+        defaults['use_cache'] = False
+    return defaults
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="VideoCodexConvertor: пакетная обработка без GUI")
+    parser.add_argument('manifest', nargs='?', help="файл со списком заданий (путь или JSON на строку)")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="число параллельных процессов, с --schedule — число ядер (по умолчанию = число ядер)")
+    parser.add_argument('--type', choices=sorted(JOB_TYPES), help="тип задания для строк без JSON")
+    parser.add_argument('--ext')
+    parser.add_argument('--size-mb', dest='size_mb', type=float)
+    parser.add_argument('--audio-kbit', dest='audio_kbit', type=int)
+    parser.add_argument('--speed', type=float)
+    parser.add_argument('--bass', type=int)
+    parser.add_argument('--treble', type=int)
+    parser.add_argument('--gain', type=int)
+    parser.add_argument('--bitrate', type=int)
+    parser.add_argument('--start', help="начало фрагмента (trim), например 00:12:03")
+    parser.add_argument('--end', help="конец фрагмента (trim), например 00:47:10")
+    parser.add_argument('--first-pass', dest='first_pass', choices=sorted(workers.FIRST_PASS_PROFILES), help="профиль первого прохода (compress_precise)")
+    parser.add_argument('--no-scale', dest='no_scale', action='store_true',
+                        help="не уменьшать разрешение и частоту кадров при малом битрейте (сжатие)")
+    parser.add_argument('--normalize', action='store_true', help="выровнять громкость по EBU R128 (sound)")
+    parser.add_argument('--segmented', action='store_true', help="кодировать по частям (convert, compress_fast)")
+    parser.add_argument('--no-cache', dest='no_cache', action='store_true', help="не брать готовые результаты из кэша")
+    parser.add_argument('--log-dir', help="каталог для логов ffmpeg по каждому заданию")
+    parser.add_argument('--metrics', default=str(METRICS_LOG), help="куда дописывать метрики заданий (JSON lines)")
+    parser.add_argument('--no-metrics', dest='no_metrics', action='store_true', help="не записывать метрики")
+    parser.add_argument('--prom', help="после пакета записать метрики в формате Prometheus (textfile collector)")
+    parser.add_argument('--json', action='store_true', help="выводить результаты как JSON lines")
+    parser.add_argument('--progress', action='store_true', help="печатать прогресс заданий в stderr")
+    parser.add_argument('--queue', action='store_true', help="вести задания через постоянную очередь (jobs.sqlite)")
+    parser.add_argument('--resume', action='store_true', help="доделать незавершённые задания из очереди")
+    parser.add_argument('--schedule', action='store_true',
+                        help="делить ядра между заданиями по их типу, короткие задания приостанавливают долгие")
+    args = parser.parse_args(argv)
+
+    if not args.manifest and not args.resume:
+        parser.error("нужен манифест или --resume")
+    jobs = []
+    if args.manifest:
+        try:
+            jobs = read_manifest(args.manifest, _defaults_from_args(args))
+        except (OSError, ValueError) as e:
+            print(f"Ошибка манифеста: {e}", file=sys.stderr)
+            return 2
+    if args.log_dir:
+        Path(args.log_dir).mkdir(parents=True, exist_ok=True)
+
+    def report(res):
+        if args.json:
+            print(json.dumps(res, ensure_ascii=False), flush=True)
+        else:
+            output = res['output']
+            if isinstance(output, list):
+                output = ', '.join(output)
+            print(f"{res['rc']}\t{res['input']}\t{output or '-'}", flush=True)
+
+    def show_progress(job, ev):
+        if args.json:
+            print(json.dumps({'input': job['input'], 'progress': ev}), file=sys.stderr, flush=True)
+            return
+        pct = f"{ev['percent']:.1f}%" if ev['percent'] is not None else f"{ev['out_time']:.0f}s"
+        eta = f" eta {ev['eta']:.0f}s" if ev['eta'] is not None else ''
+        print(f"[{job['input']}] {pct} {ev['speed'] or 0:.2f}x{eta}", file=sys.stderr, flush=True)
+
+    on_progress = show_progress if args.progress else None
+    metrics_path = None if args.no_metrics else args.metrics
+    if args.queue or args.resume:
+        queue = JobQueue()
+        skipped = sum(1 for job in jobs if not queue.add(job, owner=JOB_OWNER)[1])
+        if skipped:
+            print(f"Уже в очереди или выполнено: {skipped}", file=sys.stderr)
+        results = run_queue(queue, max_workers=args.jobs, log_dir=args.log_dir, on_result=report, on_progress=on_progress,
+                            schedule=args.schedule, metrics_path=metrics_path)
+    else:
+        results = run_batch(jobs, max_workers=args.jobs, log_dir=args.log_dir, on_result=report, on_progress=on_progress,
+                            schedule=args.schedule, metrics_path=metrics_path)
+    if args.prom and metrics_path:
+        write_prometheus(load_records(metrics_path), args.prom)
+    failed = sum(1 for r in results if r['rc'] != 0)
+    print(f"Готово: {len(results) - failed}/{len(results)}, ошибок: {failed}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
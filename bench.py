@@ -0,0 +1,192 @@
+import os
+import sys
+import json
+import socket
+import argparse
+import statistics
+from pathlib import Path
+
+from workers import (FFMPEG_BIN, ROOT, CACHE_DIR, JobLimits, use_limits, partial_path, run_subprocess,
+                     convert, compress_fast, compress_precise, process_sound)
+from metrics import run_measured
+from sizestats import learning_disabled
+
+# reproducible benchmark: synthetic inputs made locally from lavfi (testsrc2 +
+# sine), every worker path run on each of them, and the timings compared with a
+# stored baseline. CPU time is the number to watch: wall time also moves with
+# whatever else the machine is doing.
+
+BENCH_DIR = CACHE_DIR / "bench"
+BASELINE = ROOT / "bench_baseline.json"
+RESOLUTIONS = {'360p': (640, 360), '720p': (1280, 720), '1080p': (1920, 1080)}
+DURATIONS = (5, 20)
+QUICK = (('360p', 5), ('720p', 5))
+FPS = 30
+# size targets scale with the duration, so every case compresses at the same bitrate
+TARGET_KBIT = 600
+TOLERANCE = 0.15
+# same settings must give the same bytes; more than this means the output changed
+SIZE_TOLERANCE = 0.02
+
+
+def _size_mb(duration):
+    return round(TARGET_KBIT * 1000 / 8 * duration / (1024 * 1024), 3)
+
+
+BENCH_JOBS = {
+    'convert': lambda inp, d: convert(inp, 'mkv', use_cache=False),
+    'fast': lambda inp, d: compress_fast(inp, _size_mb(d), use_cache=False),
+    'precise': lambda inp, d: compress_precise(inp, _size_mb(d), use_cache=False),
+    'sound': lambda inp, d: process_sound(inp, 'mp3', bass=4, treble=2, use_cache=False),
+}
+
+
+def make_input(res, duration, write_log=None):
+    w, h = RESOLUTIONS[res]
+    out = BENCH_DIR / f"src_{res}_{duration}s.mp4"
+    if out.exists():
+        return out
+    BENCH_DIR.mkdir(parents=True, exist_ok=True)
+    part = partial_path(out)
+    cmd = [FFMPEG_BIN, '-y', '-f', 'lavfi', '-i', f"testsrc2=size={w}x{h}:rate={FPS}:duration={duration}",
+           '-f', 'lavfi', '-i', f"sine=frequency=440:sample_rate=48000:duration={duration}",
+           '-c:v', 'libx264', '-preset', 'veryfast', '-g', str(FPS * 2), '-pix_fmt', 'yuv420p',
+           '-c:a', 'aac', '-b:a', '128k', '-shortest', str(part)]
+    rc = run_subprocess(cmd, write_log=write_log)
+    if rc != 0 or not part.exists():
+        return None
+    os.replace(part, out)
+    return out
+
+
+def _remove_outputs(output):
+    for p in output if isinstance(output, list) else [output]:
+        if p:
+            try:
+                Path(p).unlink()
+            except OSError:
+                pass
+
+
+def run_case(job, inp, duration, repeat=1):
+    runs = []
+    for _ in range(repeat):
+        (rc, output), rec = run_measured(job, lambda path: BENCH_JOBS[job](path, duration), str(inp), metrics_path=None)
+        _remove_outputs(output)
+        runs.append(rec)
+        if rc != 0:
+            break
+    return {
+        'rc': max(r['rc'] for r in runs),
+        'wall': round(statistics.median(r['wall'] for r in runs), 3),
+        'cpu': round(statistics.median(r['cpu'] for r in runs), 3),
+        'peak_rss': max(r['peak_rss'] for r in runs),
+        'fps': runs[-1]['fps'],
+        'speed': runs[-1]['speed'],
+        'bytes_in': runs[-1]['bytes_in'],
+        'bytes_out': runs[-1]['bytes_out'],
+    }
+
+
+def run_suite(cases, jobs, repeat=1, threads=None, write_log=None):
+    write_log = write_log or print
+    results = {}
+    # a fixed thread count keeps the numbers comparable between machines of a different size;
+    # learned size corrections would move the bench's own targets and skew the real ones
+    with use_limits(JobLimits(threads=threads) if threads else None), learning_disabled():
+        for res, duration in cases:
+            inp = make_input(res, duration)
+            if inp is None:
+                write_log(f"Не удалось создать тестовый файл {res} {duration}s")
+                for job in jobs:
+                    results[f"{job}/{res}/{duration}s"] = {'rc': 1}
+                continue
+            for job in jobs:
+                key = f"{job}/{res}/{duration}s"
+                results[key] = r = run_case(job, inp, duration, repeat)
+                write_log(f"{key:<24} rc={r['rc']} wall={r['wall']:.2f}s cpu={r['cpu']:.2f}s "
+                          f"rss={r['peak_rss'] / 1024 ** 2:.0f}MB fps={r['fps'] or '-'}")
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    # -> list of (case, message) for everything that got worse
+    problems = []
+    for key, r in results.items():
+        if r.get('rc') != 0:
+            problems.append((key, f"ошибка (код {r.get('rc')})"))
+            continue
+        base = baseline.get(key)
+        if not base or base.get('rc') != 0:
+            continue
+        for field in ('cpu', 'wall'):
+            if base.get(field) and r[field] > base[field] * (1 + tolerance):
+                problems.append((key, f"{field}: {base[field]:.2f}s -> {r[field]:.2f}s (+{(r[field] / base[field] - 1) * 100:.0f}%)"))
+        if base.get('bytes_out') and abs(r['bytes_out'] / base['bytes_out'] - 1) > SIZE_TOLERANCE:
+            problems.append((key, f"размер: {base['bytes_out']} -> {r['bytes_out']} байт"))
+    return problems
+
+
+def load_baseline(path):
+    try:
+        with open(path, encoding='utf-8') as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def save_baseline(path, results, threads):
+    data = {'host': socket.gethostname(), 'cpus': os.cpu_count(), 'threads': threads, 'results': results}
+    Path(path).write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding='utf-8')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк обработчиков на синтетических файлах")
+    parser.add_argument('--quick', action='store_true', help="только короткие файлы 360p и 720p")
+    parser.add_argument('--res', default=','.join(RESOLUTIONS), help="разрешения через запятую")
+    parser.add_argument('--durations', default=','.join(str(d) for d in DURATIONS), help="длительности в секундах")
+    parser.add_argument('--jobs', default=','.join(BENCH_JOBS), help="обработчики через запятую")
+    parser.add_argument('--repeat', type=int, default=1, help="повторов на случай (берётся медиана)")
+    parser.add_argument('--threads', type=int, default=None, help="фиксированное число потоков ffmpeg")
+    parser.add_argument('--baseline', default=str(BASELINE))
+    parser.add_argument('--save-baseline', dest='save', action='store_true', help="записать результаты как новый эталон")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="допустимое замедление (0.15 = 15%%)")
+    parser.add_argument('--json', help="записать результаты в файл")
+    args = parser.parse_args(argv)
+
+    jobs = [j for j in args.jobs.split(',') if j]
+    unknown = [j for j in jobs if j not in BENCH_JOBS]
+    if unknown:
+        parser.error(f"неизвестные обработчики: {', '.join(unknown)}")
+    if args.quick:
+        cases = list(QUICK)
+    else:
+        resolutions = [r for r in args.res.split(',') if r]
+        if any(r not in RESOLUTIONS for r in resolutions):
+            parser.error(f"разрешения: {', '.join(RESOLUTIONS)}")
+        cases = [(r, int(d)) for r in resolutions for d in args.durations.split(',') if d]
+
+    results = run_suite(cases, jobs, repeat=args.repeat, threads=args.threads)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding='utf-8')
+    if args.save:
+        save_baseline(args.baseline, results, args.threads)
+        print(f"Эталон записан: {args.baseline}")
+        return 0 if all(r.get('rc') == 0 for r in results.values()) else 1
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"Нет эталона ({args.baseline}) — запустите с --save-baseline", file=sys.stderr)
+        return 0 if all(r.get('rc') == 0 for r in results.values()) else 1
+    if baseline.get('threads') != args.threads:
+        print(f"Внимание: эталон снят с --threads {baseline.get('threads')}", file=sys.stderr)
+    problems = compare(results, baseline.get('results', {}), args.tolerance)
+    for key, msg in problems:
+        print(f"РЕГРЕССИЯ {key}: {msg}")
+    if not problems:
+        print("Регрессий нет")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+import subprocess
+
+from workers import FFMPEG_BIN, CACHE_DIR
+
+# what this ffmpeg build can do: -encoders / -filters / -muxers, asked once per
+# binary and kept in cache/ffmpeg_caps.json under the hash of its contents.
+# The stat (path, size, mtime) -> hash mapping is stored too, so an unchanged
+# binary is neither re-run nor re-hashed. Jobs check their encoders/filters here
+# and are rejected up front instead of after a failed ffmpeg launch.
+
+CAPS_FILE = CACHE_DIR / "ffmpeg_caps.json"
+SECTIONS = ('encoders', 'filters', 'muxers')
+
+_memo = {}
+_lock = threading.Lock()
+
+
+def _resolve(binary):
+    path = shutil.which(binary) or binary
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None, None
+    return os.path.realpath(path), f"{os.path.realpath(path)}|{st.st_size}|{st.st_mtime_ns}"
+
+
+def _content_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _list(binary, section):
+    res = subprocess.run([binary, '-hide_banner', f"-{section}"], stdout=subprocess.PIPE,
+                         stderr=subprocess.DEVNULL, text=True, errors='replace')
+    if res.returncode != 0:
+        return None
+    return sorted(parse_listing(section, res.stdout))
+
+
+def parse_listing(section, text):
+    names = set()
+    started = section == 'filters'
+    for line in text.splitlines():
+        parts = line.split()
+        if not started:
+            # encoders/muxers: the legend ends with a dashes line
+            started = bool(parts) and set(parts[0]) == {'-'}
+            continue
+        if len(parts) < 2:
+            continue
+        if section == 'filters':
+            # " TSC acompressor   A->A   Audio compressor." (legend lines have no '->')
+            if len(parts) >= 3 and '->' in parts[2]:
+                names.add(parts[1])
+        elif section == 'muxers':
+            if 'E' in parts[0]:
+                names.update(parts[1].split(','))
+        else:
+            names.add(parts[1])
+    return names
+
+
+def _load():
+    try:
+        with open(CAPS_FILE, encoding='utf-8') as fh:
+            data = json.load(fh)
+        if isinstance(data, dict):
+            return data
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def _save(data):
+    CAPS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = CAPS_FILE.with_name(f".{CAPS_FILE.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(data), encoding='utf-8')
+    os.replace(tmp, CAPS_FILE)
+
+
+def capabilities(binary=None):
+    # -> {'encoders': set, 'filters': set, 'muxers': set}, or None when ffmpeg can't be run
+    binary = binary or FFMPEG_BIN
+    with _lock:
+        if binary in _memo:
+            return _memo[binary]
+        path, ident = _resolve(binary)
+        caps = None
+        if path:
+            data = _load()
+            digest = data.get('bins', {}).get(ident)
+            entry = data.get('caps', {}).get(digest) if digest else None
+            if entry is None:
+                try:
+                    digest = _content_hash(path)
+                    entry = data.get('caps', {}).get(digest)
+                    if entry is None:
+                        listed = {s: _list(path, s) for s in SECTIONS}
+                        # an empty list means whatever answered was not a real ffmpeg
+                        entry = listed if all(listed.values()) else None
+                except OSError:
+                    entry = None
+                if entry is not None:
+                    data.setdefault('bins', {})[ident] = digest
+                    data.setdefault('caps', {})[digest] = entry
+                    try:
+                        _save(data)
+                    except OSError:
+                        pass
+            if entry is not None:
+                caps = {s: set(entry[s]) for s in SECTIONS}
+        _memo[binary] = caps
+        return caps
+
+
+def missing(encoders=(), filters=(), muxers=(), binary=None):
+    # names this build lacks; empty when the build is unknown (let ffmpeg decide)
+    caps = capabilities(binary)
+    if caps is None:
+        return []
+    wanted = (('encoders', encoders), ('filters', filters), ('muxers', muxers))
+    return [name for section, names in wanted for name in names if name not in caps[section]]
+
+
+def pick_encoder(*candidates, binary=None):
+    # first candidate the build has; the first one when the build is unknown
+    caps = capabilities(binary)
+    if caps is None:
+        return candidates[0] if candidates else None
+    for name in candidates:
+        if name in caps['encoders']:
+            return name
+    return None
+
+
+def filter_names(graph):
+    # 'scale=1280:-2,fps=30' / '[0:a]volume=3dB[a]' -> names; commas inside quotes or escaped belong to arguments
+    names = []
+    part = []
+    quoted = escaped = False
+    for ch in graph + ',':
+        if escaped:
+            escaped = False
+        elif ch == '\\':
+            escaped = True
+        elif ch == "'":
+            quoted = not quoted
+        elif ch in ',;' and not quoted:
+            text = ''.join(part)
+            part = []
+            while text.lstrip().startswith('['):
+                text = text.lstrip()[text.lstrip().find(']') + 1:]
+            name = text.split('=', 1)[0].split('@', 1)[0].split('[', 1)[0].strip()
+            if name:
+                names.append(name)
+            continue
+        part.append(ch)
+    return names
+
+
+CODEC_OPTIONS = ('-c', '-codec', '-vcodec', '-acodec', '-scodec')
+FILTER_OPTIONS = ('-vf', '-af', '-filter', '-filter_complex', '-lavfi')
+
+
+def requirements(cmd):
+    # -> (encoders, filters, muxers) an ffmpeg command line asks for. Options
+    # before an -i belong to that input (decoders, demuxers) and are skipped
+    encoders, filters, muxers = [], [], []
+    args = list(cmd[1:])
+    inputs = [i for i, a in enumerate(args) if a == '-i']
+    last_input = inputs[-1] if inputs else -1
+    for i, a in enumerate(args[:-1]):
+        value = args[i + 1]
+        option = a.split(':', 1)[0]
+        if option in FILTER_OPTIONS or a in FILTER_OPTIONS:
+            filters.extend(filter_names(value))
+        elif i < last_input:
+            continue
+        elif option in CODEC_OPTIONS and value != 'copy':
+            encoders.append(value)
+        elif a == '-f':
+            muxers.append(value)
+    return encoders, filters, muxers
+
+
+def unsupported(cmd):
+    # names in the command this ffmpeg build lacks
+    encoders, filters, muxers = requirements(cmd)
+    return missing(encoders, filters, muxers, binary=cmd[0])
@@ -0,0 +1,150 @@
+# codec/container compatibility: which input streams can go into the output
+# container untouched (-c copy) and what to encode the rest with.
+# None as a codec set means "anything the muxer takes" (matroska audio/video).
+
+PCM = {'pcm_s16le', 'pcm_s24le', 'pcm_s32le', 'pcm_f32le', 'pcm_u8', 'pcm_s16be', 'pcm_s24be'}
+
+CONTAINERS = {
+    'mp4': {
+        'video': {'h264', 'hevc', 'av1', 'mpeg4', 'vp9'},
+        'audio': {'aac', 'mp3', 'ac3', 'eac3', 'alac'},
+        'subtitle': {'mov_text'},
+    },
+    'm4v': {
+        'video': {'h264', 'hevc', 'mpeg4'},
+        'audio': {'aac', 'ac3', 'alac'},
+        'subtitle': {'mov_text'},
+    },
+    'mov': {
+        'video': {'h264', 'hevc', 'mpeg4', 'prores', 'mjpeg'},
+        'audio': {'aac', 'mp3', 'ac3', 'alac'} | PCM,
+        'subtitle': {'mov_text'},
+    },
+    # matroska takes nearly any audio/video, but not mov_text: MP4 text subtitles become srt
+    'mkv': {
+        'video': None,
+        'audio': None,
+        'subtitle': {'subrip', 'ass', 'ssa', 'webvtt', 'dvd_subtitle', 'hdmv_pgs_subtitle', 'dvb_subtitle'},
+    },
+    'webm': {
+        'video': {'vp8', 'vp9', 'av1'},
+        'audio': {'opus', 'vorbis'},
+        'subtitle': {'webvtt'},
+    },
+    'avi': {
+        'video': {'h264', 'mpeg4', 'mjpeg', 'msmpeg4v3'},
+        'audio': {'mp3', 'ac3'} | PCM,
+        'subtitle': set(),
+    },
+    'ts': {
+        'video': {'h264', 'hevc', 'mpeg2video'},
+        'audio': {'aac', 'mp3', 'ac3', 'mp2'},
+        'subtitle': {'dvb_subtitle'},
+    },
+    'flv': {
+        'video': {'h264'},
+        'audio': {'aac', 'mp3'},
+        'subtitle': set(),
+    },
+    # audio-only outputs
+    'mp3': {'video': set(), 'audio': {'mp3'}, 'subtitle': set()},
+    'm4a': {'video': set(), 'audio': {'aac', 'alac'}, 'subtitle': set()},
+    'aac': {'video': set(), 'audio': {'aac'}, 'subtitle': set()},
+    'wav': {'video': set(), 'audio': PCM, 'subtitle': set()},
+    'flac': {'video': set(), 'audio': {'flac'}, 'subtitle': set()},
+    'ogg': {'video': set(), 'audio': {'vorbis', 'opus', 'flac'}, 'subtitle': set()},
+    'opus': {'video': set(), 'audio': {'opus'}, 'subtitle': set()},
+}
+
+# encoder + args used when a stream has to be re-encoded for that container
+VIDEO_ENCODERS = {
+    'webm': ['libvpx-vp9', '-crf', '32', '-b', '0'],
+    'avi': ['libx264', '-preset', 'medium', '-crf', '23'],
+}
+DEFAULT_VIDEO_ENCODER = ['libx264', '-preset', 'medium', '-crf', '23']
+
+AUDIO_ENCODERS = {
+    'webm': ['libopus', '-b', '128k'],
+    'ogg': ['libvorbis', '-b', '192k'],
+    'opus': ['libopus', '-b', '128k'],
+    'mp3': ['libmp3lame', '-b', '192k'],
+    'avi': ['libmp3lame', '-b', '192k'],
+    'wav': ['pcm_s16le'],
+    'flac': ['flac'],
+}
+DEFAULT_AUDIO_ENCODER = ['aac', '-b', '128k']
+
+SUBTITLE_ENCODERS = {
+    'mp4': 'mov_text', 'm4v': 'mov_text', 'mov': 'mov_text', 'webm': 'webvtt', 'mkv': 'srt',
+}
+TEXT_SUBTITLES = {'subrip', 'ass', 'ssa', 'mov_text', 'webvtt', 'text'}
+
+
+def _accepts(allowed, codec):
+    return allowed is None or codec in allowed
+
+
+def _per_stream(out_idx, encoder):
+    # ['libx264', '-crf', '23'] -> ['-c:3', 'libx264', '-crf:3', '23']
+    args = ['-c:' + str(out_idx), encoder[0]]
+    for i in range(1, len(encoder), 2):
+        args += [f"{encoder[i]}:{out_idx}", encoder[i + 1]]
+    return args
+
+
+def plan_streams(info, ext):
+    # -> list of (input_index, kind, action, args); action is 'copy' or 'encode'.
+    # None when the container or the streams are unknown and the caller should fall back
+    ext = ext.lower()
+    table = CONTAINERS.get(ext)
+    if table is None or not info or not info.get('streams'):
+        return None
+    plan = []
+    for s in info['streams']:
+        kind = s.get('type')
+        codec = s.get('codec')
+        if kind not in ('video', 'audio', 'subtitle') or s.get('attached_pic'):
+            continue
+        allowed = table[kind]
+        if allowed is not None and not allowed:
+            continue
+        out_idx = len(plan)
+        if _accepts(allowed, codec):
+            plan.append((s['index'], kind, 'copy', ['-c:' + str(out_idx), 'copy']))
+        elif kind == 'video':
+            plan.append((s['index'], kind, 'encode', _per_stream(out_idx, VIDEO_ENCODERS.get(ext, DEFAULT_VIDEO_ENCODER))))
+        elif kind == 'audio':
+            plan.append((s['index'], kind, 'encode', _per_stream(out_idx, AUDIO_ENCODERS.get(ext, DEFAULT_AUDIO_ENCODER))))
+        elif kind == 'subtitle' and codec in TEXT_SUBTITLES and ext in SUBTITLE_ENCODERS:
+            plan.append((s['index'], kind, 'encode', ['-c:' + str(out_idx), SUBTITLE_ENCODERS[ext]]))
+    if not any(kind in ('video', 'audio') for _, kind, _, _ in plan):
+        return None
+    return plan
+
+
+def plan_args(plan):
+    args = []
+    for in_idx, _, _, _ in plan:
+        args += ['-map', f"0:{in_idx}"]
+    for _, _, _, stream_args in plan:
+        args += stream_args
+    return args
+
+
+def encoder_args(kind, ext):
+    # whole-file form for single-stream commands: ['-c:v', 'libx264', '-crf:v', '23', ...]
+    ext = ext.lower()
+    if kind == 'video':
+        return _per_stream('v', VIDEO_ENCODERS.get(ext, DEFAULT_VIDEO_ENCODER))
+    return _per_stream('a', AUDIO_ENCODERS.get(ext, DEFAULT_AUDIO_ENCODER))
+
+
+def describe_plan(plan, info):
+    codecs = {s['index']: s.get('codec') for s in info['streams']}
+    lines = []
+    for in_idx, kind, action, args in plan:
+        if action == 'copy':
+            lines.append(f"поток {in_idx} ({kind} {codecs.get(in_idx)}): копирование")
+        else:
+            lines.append(f"поток {in_idx} ({kind} {codecs.get(in_idx)}): перекодировка -> {args[1]}")
+    return lines
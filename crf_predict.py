@@ -0,0 +1,173 @@
+import sys
+import math
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from workers import (FFMPEG_BIN, SAVES_DIR, unique_path, partial_path, run_subprocess, ffprobe_duration,
+                     video_bitrate_for_size, compress_fast, compress_precise, finish_job, noop_log,
+                     result_cached, current_limits, use_limits, current_metrics, use_metrics, fit_video_filters,
+                     size_correction, enforce_size_cap, reencode_inputs, check_build)
+
+# target size without a second pass: encode a few short clips at several CRF
+# values, fit log(bitrate) ~ crf (x264 bitrate is close to exponential in CRF),
+# then do one CRF encode at the value predicted to hit the target
+
+SAMPLE_COUNT = 5
+SAMPLE_SEC = 4.0
+SAMPLE_CRFS = (20, 26, 32)
+PRESET = 'fast'
+
+
+def sample_starts(duration, count=SAMPLE_COUNT, length=SAMPLE_SEC):
+    length = min(length, duration / count)
+    return [max(duration * (i + 0.5) / count - length / 2, 0.0) for i in range(count)], length
+
+
+def _encode_sample(inp, start, length, crf, out, limits=None, scale_args=(), metrics=None):
+    cmd = [FFMPEG_BIN, '-y', '-ss', f"{start:.3f}", '-t', f"{length:.3f}", '-i', str(inp), '-an', '-sn'] + list(scale_args) + [
+           '-c:v', 'libx264', '-preset', PRESET, '-crf', str(crf), '-f', 'matroska', str(out)]
+    with use_limits(limits), use_metrics(metrics):
+        rc = run_subprocess(cmd)
+    if rc != 0 or not out.exists():
+        return None
+    return out.stat().st_size
+
+
+def fit_crf(points, target_bps):
+    # least squares on (crf, ln bps)
+    xs = [c for c, _ in points]
+    ys = [math.log(b) for _, b in points]
+    n = len(points)
+    mx = sum(xs) / n
+    my = sum(ys) / n
+    sxx = sum((x - mx) ** 2 for x in xs)
+    if sxx == 0:
+        return None
+    slope = sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sxx
+    if slope >= 0:
+        return None
+    crf = mx + (math.log(target_bps) - my) / slope
+    return round(min(max(crf, 0.0), 51.0), 1)
+
+
+def predict_crf(inp, duration, video_bps, write_log=None, scale_args=()):
+    write_log = write_log or noop_log
+    starts, length = sample_starts(duration)
+    tmp = Path(tempfile.mkdtemp(prefix='vcc_crf_'))
+    try:
+        tasks = [(crf, i, s) for crf in SAMPLE_CRFS for i, s in enumerate(starts)]
+        limits = current_limits()
+        metrics = current_metrics()
+        workers = len(limits.cpus) if limits and limits.cpus else None
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            sizes = list(pool.map(lambda t: _encode_sample(inp, t[2], length, t[0], tmp / f"s_{t[0]}_{t[1]}.mkv", limits, scale_args, metrics), tasks))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    points = []
+    for crf in SAMPLE_CRFS:
+        got = [sz for (c, _, _), sz in zip(tasks, sizes) if c == crf and sz]
+        if got:
+            bps = sum(got) * 8 / (length * len(got))
+            points.append((crf, bps))
+            write_log(f"Пробы CRF {crf}: ~{int(bps)} bps")
+    if len(points) < 2:
+        return None
+    return fit_crf(points, video_bps)
+
+
+@result_cached('compress_crf')
+def compress_crf(input_path, size_mb, audio_kbit=128, capped=True, auto_scale=True, write_log=None, on_progress=None):
+    write_log = write_log or noop_log
+    inp = Path(input_path)
+    if not inp.exists():
+        write_log(f"Файл не найден: {input_path}")
+        return (2, None)
+    if not check_build(write_log, encoders=('libx264', 'aac')):
+        return (2, None)
+
+    duration = ffprobe_duration(inp)
+    if not duration or duration <= 0:
+        write_log("Не удалось получить длительность видео (ffprobe)")
+        return (1, None)
+
+    correction = size_correction('crf', inp.suffix, write_log)
+    video_bps = video_bitrate_for_size(size_mb, audio_kbit, duration, write_log, correction)
+    audio_bitrate = f"{audio_kbit}k"
+
+    # samples are encoded at the size the final encode will use
+    scale_args = fit_video_filters(inp, video_bps, write_log) if auto_scale else []
+    crf = predict_crf(inp, duration, video_bps, write_log, scale_args)
+    if crf is None:
+        write_log("Не удалось построить прогноз CRF — используем быстрое сжатие")
+        return compress_fast(input_path, size_mb, audio_kbit, auto_scale=auto_scale, write_log=write_log, on_progress=on_progress)
+
+    out_name = inp.stem + f"_compressed_crf{inp.suffix}"
+    out_path = SAVES_DIR / out_name
+    out_path = unique_path(out_path)
+    part = partial_path(out_path)
+
+    write_log(f"Длительность: {duration:.2f} s")
+    write_log(f"Целевой размер: {size_mb} MB -> video_bitrate={video_bps} bps, прогноз CRF={crf}")
+
+    cmd = [FFMPEG_BIN, '-y', '-i', str(inp)] + scale_args + ['-c:v', 'libx264', '-preset', PRESET, '-crf', str(crf)]
+    if capped:
+        # VBV cap keeps hard scenes from blowing the budget when the samples missed them
+        cmd += ['-maxrate', str(int(video_bps * 1.5)), '-bufsize', str(int(video_bps * 3))]
+    cmd += ['-c:a', 'aac', '-b:a', audio_bitrate, str(part)]
+    write_log(f"Команда (CRF): {' '.join(cmd)}")
+    rc = run_subprocess(cmd, write_log=write_log, on_progress=on_progress, duration=duration)
+
+    def redo(bps, dest, audio_from):
+        # the prediction missed: plain average bitrate is the safer bet the second time
+        inputs, copy_audio = reencode_inputs(inp, audio_from)
+        cmd = [FFMPEG_BIN, '-y'] + inputs + scale_args + ['-c:v', 'libx264', '-preset', PRESET, '-b:v', str(bps)] + copy_audio + [str(dest)]
+        write_log(f"Команда (повтор): {' '.join(cmd)}")
+        return run_subprocess(cmd, write_log=write_log, on_progress=on_progress, duration=duration)
+
+    result = finish_job(rc, out_path, write_log, "Не удалось создать выходной файл")
+    return enforce_size_cap(result, size_mb, correction, audio_kbit, duration, video_bps, 'crf', redo, write_log)
+
+
+STRATEGIES = {
+    'fast': compress_fast,
+    'precise': compress_precise,
+    'crf': compress_crf,
+}
+
+
+def compare_strategies(input_path, size_mb, audio_kbit=128, write_log=None):
+    rows = []
+    for name, func in STRATEGIES.items():
+        t0 = time.monotonic()
+        rc, out_path = func(input_path, size_mb, audio_kbit, write_log=write_log, use_cache=False)
+        elapsed = time.monotonic() - t0
+        row = {'strategy': name, 'rc': rc, 'seconds': round(elapsed, 2), 'output': str(out_path) if out_path else None}
+        if out_path:
+            actual_mb = out_path.stat().st_size / (1024 * 1024)
+            row['size_mb'] = round(actual_mb, 3)
+            row['error_pct'] = round((actual_mb - size_mb) / size_mb * 100, 2)
+        rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сравнение стратегий сжатия до заданного размера")
+    parser.add_argument('input')
+    parser.add_argument('--size-mb', dest='size_mb', type=float, required=True)
+    parser.add_argument('--audio-kbit', dest='audio_kbit', type=int, default=128)
+    args = parser.parse_args(argv)
+
+    rows = compare_strategies(args.input, args.size_mb, args.audio_kbit)
+    print(f"{'стратегия':<10} {'время, с':>10} {'размер, МБ':>12} {'ошибка, %':>10}")
+    for r in rows:
+        print(f"{r['strategy']:<10} {r['seconds']:>10} {r.get('size_mb', '-'):>12} {r.get('error_pct', '-'):>10}")
+    return 0 if all(r['rc'] == 0 for r in rows) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+import io
+import os
+import sys
+import hashlib
+import wave
+import threading
+import subprocess
+from pathlib import Path
+from collections import OrderedDict
+
+from workers import FFMPEG_BIN, FFPLAY_BIN, SAVES_DIR, unique_path, partial_path, sound_filters, loudnorm_filters, noop_log
+from probe import file_identity, measure_loudness
+
+# equalizer audition: a short window of the source is decoded once to raw PCM
+# and kept in memory; every slider change only runs the filter chain over that
+# buffer (pipe in, pipe out), which takes a fraction of a second.
+
+RATE = 44100
+CHANNELS = 2
+SAMPLE_BYTES = 2
+PREVIEW_SEC = 10.0
+MAX_WINDOWS = 8
+MAX_RENDERS = 16
+
+_windows = OrderedDict()
+_renders = OrderedDict()
+_lock = threading.Lock()
+
+
+def _remember(cache, key, value, limit):
+    with _lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > limit:
+            cache.popitem(last=False)
+
+
+def _recall(cache, key):
+    with _lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def decode_window(input_path, start=0.0, length=PREVIEW_SEC):
+    key = (file_identity(input_path), round(start, 3), round(length, 3))
+    pcm = _recall(_windows, key)
+    if pcm is not None:
+        return pcm
+    cmd = [FFMPEG_BIN, '-v', 'error', '-ss', f"{start:.3f}", '-t', f"{length:.3f}", '-i', str(input_path),
+           '-vn', '-ac', str(CHANNELS), '-ar', str(RATE), '-f', 's16le', 'pipe:1']
+    res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if res.returncode != 0 or not res.stdout:
+        return None
+    _remember(_windows, key, res.stdout, MAX_WINDOWS)
+    return res.stdout
+
+
+def render(pcm, speed=1.0, bass=0, treble=0, gain=0, loudness=None):
+    # the same chain process_sound puts into -af
+    af = sound_filters(speed, bass, treble, gain)
+    if loudness:
+        af = loudnorm_filters(loudness, sample_rate=RATE) + af
+    if not af:
+        return pcm
+    key = (hashlib.blake2b(pcm, digest_size=16).digest(), ','.join(af))
+    out = _recall(_renders, key)
+    if out is not None:
+        return out
+    raw = ['-f', 's16le', '-ar', str(RATE), '-ac', str(CHANNELS)]
+    cmd = [FFMPEG_BIN, '-v', 'error'] + raw + ['-i', 'pipe:0', '-af', ','.join(af)] + raw + ['pipe:1']
+    res = subprocess.run(cmd, input=pcm, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if res.returncode != 0:
+        return None
+    _remember(_renders, key, res.stdout, MAX_RENDERS)
+    return res.stdout
+
+
+def to_wav(pcm):
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as w:
+        w.setnchannels(CHANNELS)
+        w.setsampwidth(SAMPLE_BYTES)
+        w.setframerate(RATE)
+        w.writeframes(pcm)
+    return buf.getvalue()
+
+
+def play(pcm):
+    # blocks until the fragment has played
+    if sys.platform == 'win32':
+        import winsound
+        winsound.PlaySound(to_wav(pcm), winsound.SND_MEMORY)
+        return 0
+    cmd = [FFPLAY_BIN, '-v', 'error', '-nodisp', '-autoexit', '-f', 's16le', '-ar', str(RATE),
+           '-ac', str(CHANNELS), '-i', 'pipe:0']
+    try:
+        return subprocess.run(cmd, input=pcm).returncode
+    except OSError:
+        return 1
+
+
+def export(pcm, input_path):
+    out_path = unique_path(SAVES_DIR / f"{Path(input_path).stem}_preview.wav")
+    part = partial_path(out_path)
+    part.write_bytes(to_wav(pcm))
+    os.replace(part, out_path)
+    return out_path
+
+
+def audition(input_path, start=0.0, length=PREVIEW_SEC, speed=1.0, bass=0, treble=0, gain=0,
+             normalize=False, save=False, write_log=None):
+    write_log = write_log or noop_log
+    if not Path(input_path).exists():
+        write_log(f"Файл не найден: {input_path}")
+        return None
+    try:
+        pcm = decode_window(input_path, start, length)
+        # whole-file measurement, so the fragment sounds as loud as it will in the export
+        loudness = measure_loudness(input_path) if normalize and pcm is not None else None
+        out = render(pcm, speed, bass, treble, gain, loudness) if pcm is not None else None
+    except OSError as e:
+        write_log(f"Не удалось запустить ffmpeg: {e}")
+        return None
+    if pcm is None:
+        write_log("Не удалось декодировать фрагмент для прослушивания")
+        return None
+    if out is None:
+        write_log("Не удалось применить эквалайзер к фрагменту")
+        return None
+    if save:
+        path = export(out, input_path)
+        write_log(f"Фрагмент сохранён: {path}")
+        return path
+    if play(out) != 0:
+        write_log("Не удалось воспроизвести фрагмент (нужен ffplay) — сохраните его кнопкой «Сохранить фрагмент»")
+    return out
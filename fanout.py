@@ -0,0 +1,182 @@
+import os
+from pathlib import Path
+
+from workers import (FFMPEG_BIN, SAVES_DIR, SOUND_CODECS, unique_path, partial_path, run_subprocess, noop_log,
+                     choose_encoder, video_bitrate_for_size, sound_filters, loudnorm_filters, fit_video_filters,
+                     result_cached, size_correction, enforce_size_cap, reencode_inputs)
+from probe import probe_media, measure_loudness
+from compat import CONTAINERS, encoder_args
+
+# one input -> several outputs in a single ffmpeg run: the source is demuxed and
+# decoded once, decoded video/audio is split (split/asplit) into one branch per
+# output that needs encoding, copied streams are mapped straight from the input.
+#
+# outputs: [{"type": "convert", "ext": "mp4"},
+#           {"type": "compress", "size_mb": 10, "audio_kbit": 128},
+#           {"type": "sound", "ext": "mp3", "bass": 6, "bitrate": 192, "normalize": true}]
+
+
+def _output_path(name):
+    # reserved on disk, so two outputs with the same name get different ones
+    return unique_path(SAVES_DIR / name)
+
+
+def build_fanout(inp, info, outputs, write_log=None):
+    write_log = write_log or noop_log
+    video = info.get('video')
+    audio = info.get('audio')
+    duration = info.get('duration')
+
+    # first pass over the outputs: stream needs + per-output args that don't depend on labels
+    specs = []
+    for o in outputs:
+        kind = o.get('type')
+        if kind == 'convert':
+            ext = o['ext'].strip().lstrip('.').lower()
+            table = CONTAINERS.get(ext, CONTAINERS['mkv'])
+            spec = {'path': _output_path(f"{inp.stem}.{ext}")}
+            if video and table['video'] != set():
+                if table['video'] is None or video['codec'] in table['video']:
+                    spec['video'] = ('copy', ['-c:v', 'copy'])
+                else:
+                    spec['video'] = ('encode', encoder_args('video', ext))
+            if audio and table['audio'] != set():
+                if table['audio'] is None or audio['codec'] in table['audio']:
+                    spec['audio'] = ('copy', ['-c:a', 'copy'])
+                else:
+                    spec['audio'] = ('encode', encoder_args('audio', ext), None)
+        elif kind == 'compress':
+            if not video or not duration:
+                write_log("Сжатие пропущено: нет видеопотока или длительности")
+                continue
+            audio_kbit = int(o.get('audio_kbit', 128))
+            # same encoder settings as compress_fast, so it learns from and feeds the same corrections
+            correction = size_correction('fast', inp.suffix, write_log)
+            video_bps = video_bitrate_for_size(float(o['size_mb']), audio_kbit, duration, write_log, correction)
+            spec = {'path': _output_path(f"{inp.stem}_compressed_{float(o['size_mb']):g}mb{inp.suffix}")}
+            spec['video'] = ('encode', ['-c:v', 'libx264', '-b:v', str(video_bps), '-preset', 'fast'])
+            if o.get('auto_scale', True):
+                fit = fit_video_filters(inp, video_bps, write_log)
+                if fit:
+                    spec['video_chain'] = fit[1]
+            spec['target'] = {'size_mb': float(o['size_mb']), 'correction': correction, 'audio_kbit': audio_kbit,
+                              'video_bps': video_bps, 'chain': spec.get('video_chain')}
+            if audio:
+                spec['audio'] = ('encode', ['-c:a', 'aac', '-b:a', f"{audio_kbit}k"], None)
+        elif kind == 'sound':
+            if not audio:
+                write_log("Эквалайзер пропущен: нет аудиопотока")
+                continue
+            ext = o['ext'].strip().lstrip('.').lower()
+            af = sound_filters(float(o.get('speed', 1.0)), int(o.get('bass', 0)), int(o.get('treble', 0)), int(o.get('gain', 0)))
+            if o.get('normalize'):
+                measured = measure_loudness(inp)
+                if measured:
+                    af = loudnorm_filters(measured, sample_rate=audio.get('sample_rate')) + af
+                else:
+                    write_log("Не удалось измерить громкость — нормализация пропущена")
+            codec = SOUND_CODECS.get(ext, 'copy')
+            if codec != 'copy':
+                codec = choose_encoder(codec, write_log)
+                if codec is None:
+                    write_log(f"Выход {ext} пропущен: эта сборка ffmpeg не умеет его кодировать")
+                    continue
+            spec = {'path': _output_path(f"{inp.stem}_sound.{ext}")}
+            if codec == 'copy' and not af:
+                spec['audio'] = ('copy', ['-c:a', 'copy'])
+            else:
+                codec = codec if codec != 'copy' else 'aac'
+                spec['audio'] = ('encode', ['-c:a', codec, '-b:a', f"{int(o.get('bitrate', 192))}k"], ','.join(af) or None)
+        else:
+            write_log(f"Неизвестный тип выхода: {kind}")
+            continue
+        specs.append(spec)
+
+    if not specs:
+        return None, [], {}
+
+    # filter graph: one split per decoded stream, optional per-branch audio chain
+    v_branches = [s for s in specs if s.get('video', ('',))[0] == 'encode']
+    a_branches = [s for s in specs if s.get('audio', ('',))[0] == 'encode']
+    graph = []
+    if v_branches:
+        labels = [f"v{i}" for i in range(len(v_branches))]
+        graph.append(f"[0:v:0]split={len(labels)}" + ''.join(f"[{l}]" for l in labels))
+        for s, l in zip(v_branches, labels):
+            if s.get('video_chain'):
+                graph.append(f"[{l}]{s['video_chain']}[{l}f]")
+                s['video_label'] = f"[{l}f]"
+            else:
+                s['video_label'] = f"[{l}]"
+    if a_branches:
+        labels = [f"a{i}" for i in range(len(a_branches))]
+        graph.append(f"[0:a:0]asplit={len(labels)}" + ''.join(f"[{l}]" for l in labels))
+        for s, l in zip(a_branches, labels):
+            chain = s['audio'][2]
+            if chain:
+                graph.append(f"[{l}]{chain}[{l}f]")
+                s['audio_label'] = f"[{l}f]"
+            else:
+                s['audio_label'] = f"[{l}]"
+
+    cmd = [FFMPEG_BIN, '-y', '-i', str(inp)]
+    if graph:
+        cmd += ['-filter_complex', ';'.join(graph)]
+    for s in specs:
+        if 'video' in s:
+            cmd += ['-map', s.get('video_label', '0:v:0')] + s['video'][1]
+        if 'audio' in s:
+            cmd += ['-map', s.get('audio_label', '0:a:0')] + s['audio'][1]
+        cmd.append(str(partial_path(s['path'])))
+    # size-targeted outputs: path -> what enforce_size_cap needs afterwards
+    return cmd, [s['path'] for s in specs], {s['path']: s['target'] for s in specs if 'target' in s}
+
+
+def _cap_size(inp, path, target, duration, write_log):
+    # a compress output goes through the same record/over-cap redo as compress_fast
+    chain = ['-vf', target['chain']] if target['chain'] else []
+
+    def redo(video_bps, dest, audio_from):
+        inputs, copy_audio = reencode_inputs(inp, audio_from)
+        cmd = [FFMPEG_BIN, '-y'] + inputs + chain + ['-c:v', 'libx264', '-b:v', str(video_bps), '-preset', 'fast'] + copy_audio + [str(dest)]
+        write_log(f"Команда (повтор): {' '.join(cmd)}")
+        return run_subprocess(cmd, write_log=write_log)
+
+    return enforce_size_cap((0, path), target['size_mb'], target['correction'], target['audio_kbit'], duration,
+                            target['video_bps'], 'fast', redo, write_log)
+
+
+@result_cached('fanout')
+def fanout(input_path, outputs, write_log=None, on_progress=None):
+    write_log = write_log or noop_log
+    inp = Path(input_path)
+    if not inp.exists():
+        write_log(f"Файл не найден: {input_path}")
+        return (2, None)
+    info = probe_media(inp)
+    if not info:
+        write_log("Не удалось прочитать параметры файла (ffprobe)")
+        return (1, None)
+
+    cmd, paths, targets = build_fanout(inp, info, outputs, write_log)
+    if not cmd:
+        write_log("Нет выходов для обработки")
+        return (1, None)
+    write_log(f"Команда (несколько выходов): {' '.join(cmd)}")
+    rc = run_subprocess(cmd, write_log=write_log, on_progress=on_progress, duration=info.get('duration'))
+
+    done = []
+    for p in paths:
+        part = partial_path(p)
+        if rc == 0 and part.exists():
+            os.replace(part, p)
+            done.append(p)
+            write_log(f"Готово: {p}")
+            if p in targets:
+                _cap_size(inp, p, targets[p], info['duration'], write_log)
+        elif part.exists():
+            part.unlink()
+    if rc != 0 or len(done) != len(paths):
+        write_log("Не все выходные файлы созданы")
+        return (rc or 1, done)
+    return (0, done)
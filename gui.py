@@ -0,0 +1,562 @@
+import os
+import threading
+from collections import deque
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+from workers import convert, compress_precise, compress_fast, process_sound
+from crf_predict import compress_crf
+from trim import trim
+from preview import contact_sheet, proxy_clip
+from images import convert_images
+from eq_preview import audition, PREVIEW_SEC
+from jobqueue import JobQueue, RUNNING
+from scheduler import Scheduler, BACKGROUND
+from metrics import METRICS_LOG, run_measured
+
+LOG_FLUSH_MS = 200
+LOG_BUFFER_LINES = 2000
+LOG_MAX_LINES = 1000
+JOB_OWNER = 'gui'
+
+
+class App(tk.Tk):
+    def __init__(self):
+        super().__init__()
+        self.title("VideoCodexConvertor DEV 1.04")
+        self.geometry("780x520")
+
+        self.notebook = ttk.Notebook(self)
+        self.notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        self.conv_frame = ttk.Frame(self.notebook)
+        self.comp_prec_frame = ttk.Frame(self.notebook)
+        self.comp_fast_frame = ttk.Frame(self.notebook)
+        self.comp_crf_frame = ttk.Frame(self.notebook)
+        self.sound_frame = ttk.Frame(self.notebook)
+
+        self.notebook.add(self.conv_frame, text="конвертация")
+        self.notebook.add(self.comp_prec_frame, text="сжатие (точное)")
+        self.notebook.add(self.comp_fast_frame, text="сжатие (быстрое)")
+        self.notebook.add(self.comp_crf_frame, text="сжатие (CRF)")
+        self.notebook.add(self.sound_frame, text="Эквалайзер")
+
+        self._build_conversion_tab()
+        self._build_compression_precise_tab()
+        self._build_compression_fast_tab()
+        self._build_compression_crf_tab()
+        self._build_sound_tab()
+
+        progress_row = ttk.Frame(self)
+        progress_row.pack(fill=tk.X, padx=12)
+        self.progress_bar = ttk.Progressbar(progress_row, orient=tk.HORIZONTAL, mode='determinate', maximum=100)
+        self.progress_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.progress_label = ttk.Label(progress_row, text="", width=36)
+        self.progress_label.pack(side=tk.LEFT, padx=6)
+
+        log_label = ttk.Label(self, text="Лог:")
+        log_label.pack(anchor=tk.W, padx=12)
+        self.log_text = tk.Text(self, height=8)
+        self.log_text.pack(fill=tk.BOTH, expand=False, padx=12, pady=(0,12))
+        self.log_text.configure(state=tk.DISABLED)
+
+        # workers only append here; the Tk side drains it on a timer
+        self._log_buffer = deque(maxlen=LOG_BUFFER_LINES)
+        self._progress = None
+        self.after(LOG_FLUSH_MS, self._flush_log)
+
+        self.jobs = JobQueue()
+        # all tabs share the cores; an equalizer run may pause a long compression
+        self.scheduler = Scheduler()
+        self.after(500, self._resume_jobs)
+
+    def _resume_jobs(self):
+        # jobs that were running when the app was closed or crashed
+        # only our own: watch.py and batch.py --queue share jobs.sqlite and resume theirs themselves
+        self.jobs.recover(owner=JOB_OWNER)
+        if not self.jobs.counts(owner=JOB_OWNER).get('queued'):
+            return
+        self.write_log("Есть незавершённые задания — продолжаем их")
+        threading.Thread(target=self._resume_worker, daemon=True).start()
+
+    def _resume_worker(self):
+        from batch import run_job
+        while True:
+            item = self.jobs.claim(owner=JOB_OWNER)
+            if item is None:
+                break
+            job_id, job = item
+            self.write_log(f"Продолжаем: {job['type']} {job['input']}")
+            res = self.scheduler.submit(run_job, job, None, None, job_id, METRICS_LOG, kind=job['type'],
+                                        priority=BACKGROUND).result()
+            self.jobs.finish(job_id, res['rc'], res['output'], res.get('error'))
+            self.write_log(f"Готово: {res['output']}" if res['rc'] == 0 else f"Ошибка ({res['rc']}): {job['input']}")
+
+    def _run_job(self, kind, func, input_path, params, btn):
+        job_id = None
+        rc, out = 1, None
+        try:
+            job_id, _ = self.jobs.add(dict(params, type=kind, input=input_path), state=RUNNING, owner=JOB_OWNER)
+            # kind goes to the scheduler, the positional one to run_measured
+            (rc, out), _ = self.scheduler.submit(run_measured, kind, func, input_path, kind=kind, write_log=self.write_log,
+                                                 on_progress=self.set_progress, **params).result()
+        except Exception as e:
+            self.write_log(f"Ошибка: {e}")
+        finally:
+            if job_id is not None:
+                self.jobs.finish(job_id, rc, out)
+            self.after(0, lambda: btn.configure(state=tk.NORMAL))
+
+    def show_preview(self, var):
+        input_path = var.get().strip()
+        if not input_path:
+            messagebox.showerror("Ошибка", "Выберите файл")
+            return
+        threading.Thread(target=self._preview_worker, args=(input_path,), daemon=True).start()
+
+    def _preview_worker(self, input_path):
+        sheet = contact_sheet(input_path, write_log=self.write_log)
+        if sheet:
+            self.after(0, self._open_preview, input_path, sheet)
+        clip = proxy_clip(input_path, write_log=self.write_log)
+        if clip:
+            self.write_log(f"Превью-ролик: {clip}")
+
+    def _open_preview(self, input_path, sheet):
+        win = tk.Toplevel(self)
+        win.title(f"Превью: {input_path}")
+        image = tk.PhotoImage(file=str(sheet))
+        label = ttk.Label(win, image=image)
+        label.image = image
+        label.pack()
+
+    def write_log(self, text):
+        if not text.endswith('\n'):
+            text += '\n'
+        self._log_buffer.append(text)
+
+    def set_progress(self, event):
+        self._progress = event
+
+    def _flush_log(self):
+        lines = []
+        while self._log_buffer:
+            lines.append(self._log_buffer.popleft())
+        if lines:
+            self.log_text.configure(state=tk.NORMAL)
+            self.log_text.insert(tk.END, ''.join(lines))
+            extra = int(self.log_text.index('end-1c').split('.')[0]) - LOG_MAX_LINES
+            if extra > 0:
+                self.log_text.delete('1.0', f"{extra + 1}.0")
+            self.log_text.see(tk.END)
+            self.log_text.configure(state=tk.DISABLED)
+
+        ev = self._progress
+        if ev is not None:
+            self._progress = None
+            if ev['percent'] is not None:
+                self.progress_bar.configure(value=ev['percent'])
+            text = f"{ev['out_time']:.0f} s"
+            if ev['speed']:
+                text += f"  {ev['speed']:.2f}x"
+            if ev['fps']:
+                text += f"  {ev['fps']:.0f} fps"
+            if ev['eta'] is not None and not ev['done']:
+                text += f"  осталось {int(ev['eta'] // 60)}:{int(ev['eta'] % 60):02d}"
+            self.progress_label.configure(text=text)
+        self.after(LOG_FLUSH_MS, self._flush_log)
+
+    def _build_conversion_tab(self):
+        f = self.conv_frame
+        padx = 8; pady = 6
+
+        row = ttk.Frame(f)
+        row.pack(fill=tk.X, padx=12, pady=pady)
+        ttk.Label(row, text="Файл:").pack(side=tk.LEFT)
+        self.conv_input_var = tk.StringVar()
+        ttk.Entry(row, textvariable=self.conv_input_var, width=60).pack(side=tk.LEFT, padx=6)
+        ttk.Button(row, text="Обзор", command=self.conv_browse).pack(side=tk.LEFT)
+        ttk.Button(row, text="Превью", command=lambda: self.show_preview(self.conv_input_var)).pack(side=tk.LEFT, padx=4)
+        ttk.Button(row, text="Папка", command=self.conv_browse_dir).pack(side=tk.LEFT)
+
+        row2 = ttk.Frame(f)
+        row2.pack(fill=tk.X, padx=12, pady=pady)
+        ttk.Label(row2, text="Выходное расширение (без точки), например mp4, png, jpg, webp ").pack(side=tk.LEFT)
+        self.conv_ext_var = tk.StringVar(value="mp4")
+        ttk.Entry(row2, textvariable=self.conv_ext_var, width=10).pack(side=tk.LEFT, padx=6)
+
+        row_cut = ttk.Frame(f)
+        row_cut.pack(fill=tk.X, padx=12, pady=pady)
+        ttk.Label(row_cut, text="Вырезать фрагмент с").pack(side=tk.LEFT)
+        self.conv_start_var = tk.StringVar()
+        ttk.Entry(row_cut, textvariable=self.conv_start_var, width=10).pack(side=tk.LEFT, padx=6)
+        ttk.Label(row_cut, text="по").pack(side=tk.LEFT)
+        self.conv_end_var = tk.StringVar()
+        ttk.Entry(row_cut, textvariable=self.conv_end_var, width=10).pack(side=tk.LEFT, padx=6)
+        ttk.Label(row_cut, text="(чч:мм:сс, пусто — весь файл)").pack(side=tk.LEFT)
+
+        row3 = ttk.Frame(f)
+        row3.pack(fill=tk.X, padx=12, pady=pady)
+        self.conv_btn = ttk.Button(row3, text="Конвертировать", command=self.start_conversion)
+        self.conv_btn.pack(side=tk.LEFT)
+        self.conv_segmented_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(row3, text="по частям (параллельно)", variable=self.conv_segmented_var).pack(side=tk.LEFT, padx=12)
+
+        ttk.Label(row3, text="").pack(side=tk.LEFT)
+
+    def _build_compression_precise_tab(self):
+        f = self.comp_prec_frame
+        padx = 8; pady = 6
+
+        row = ttk.Frame(f)
+        row.pack(fill=tk.X, padx=12, pady=pady)
+        ttk.Label(row, text="Видео файл:").pack(side=tk.LEFT)
+        self.comp_prec_input_var = tk.StringVar()
+        ttk.Entry(row, textvariable=self.comp_prec_input_var, width=60).pack(side=tk.LEFT, padx=6)
+        ttk.Button(row, text="Обзор", command=self.comp_prec_browse).pack(side=tk.LEFT)
+        ttk.Button(row, text="Превью", command=lambda: self.show_preview(self.comp_prec_input_var)).pack(side=tk.LEFT, padx=4)
+
+        row2 = ttk.Frame(f)
+        row2.pack(fill=tk.X, padx=12, pady=pady)
+        ttk.Label(row2, text="Желаемый размер (МБ):").pack(side=tk.LEFT)
+        self.comp_prec_size_var = tk.StringVar(value="10")
+        ttk.Entry(row2, textvariable=self.comp_prec_size_var, width=10).pack(side=tk.LEFT, padx=6)
+
+        ttk.Label(row2, text="Аудио-битрейт (кбит/с, по умолчанию 128):").pack(side=tk.LEFT, padx=12)
+        self.comp_prec_audio_var = tk.StringVar(value="128")
+        ttk.Entry(row2, textvariable=self.comp_prec_audio_var, width=6).pack(side=tk.LEFT)
+
+        row3 = ttk.Frame(f)
+        row3.pack(fill=tk.X, padx=12, pady=pady)
+        self.comp_prec_btn = ttk.Button(row3, text="Сжать", command=self.start_compression_precise)
+        self.comp_prec_btn.pack(side=tk.LEFT)
+        self.comp_prec_fast_pass_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(row3, text="быстрый первый проход", variable=self.comp_prec_fast_pass_var).pack(side=tk.LEFT, padx=12)
+
+        ttk.Label(row3, text="   (двухпроходное кодирование более точное, но медленее кодируется)").pack(side=tk.LEFT)
+
+    def _build_compression_fast_tab(self):
+        f = self.comp_fast_frame
+        padx = 8; pady = 6
+
+        row = ttk.Frame(f)
+        row.pack(fill=tk.X, padx=12, pady=pady)
+        ttk.Label(row, text="Видео файл:").pack(side=tk.LEFT)
+        self.comp_fast_input_var = tk.StringVar()
+        ttk.Entry(row, textvariable=self.comp_fast_input_var, width=60).pack(side=tk.LEFT, padx=6)
+        ttk.Button(row, text="Обзор", command=self.comp_fast_browse).pack(side=tk.LEFT)
+        ttk.Button(row, text="Превью", command=lambda: self.show_preview(self.comp_fast_input_var)).pack(side=tk.LEFT, padx=4)
+
+        row2 = ttk.Frame(f)
+        row2.pack(fill=tk.X, padx=12, pady=pady)
+        ttk.Label(row2, text="Желаемый размер (МБ):").pack(side=tk.LEFT)
+        self.comp_fast_size_var = tk.StringVar(value="10")
+        ttk.Entry(row2, textvariable=self.comp_fast_size_var, width=10).pack(side=tk.LEFT, padx=6)
+
+        ttk.Label(row2, text="Аудио-битрейт (по умолчанию 128):").pack(side=tk.LEFT, padx=12)
+        self.comp_fast_audio_var = tk.StringVar(value="128")
+        ttk.Entry(row2, textvariable=self.comp_fast_audio_var, width=6).pack(side=tk.LEFT)
+
+        row3 = ttk.Frame(f)
+        row3.pack(fill=tk.X, padx=12, pady=pady)
+        self.comp_fast_btn = ttk.Button(row3, text="Сжать", command=self.start_compression_fast)
+        self.comp_fast_btn.pack(side=tk.LEFT)
+        self.comp_fast_segmented_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(row3, text="по частям (параллельно)", variable=self.comp_fast_segmented_var).pack(side=tk.LEFT, padx=12)
+
+        ttk.Label(row3, text="   (одно-проходное кодирование быстрое но менее точное)").pack(side=tk.LEFT)
+
+    def _build_compression_crf_tab(self):
+        f = self.comp_crf_frame
+        padx = 8; pady = 6
+
+        row = ttk.Frame(f)
+        row.pack(fill=tk.X, padx=12, pady=pady)
+        ttk.Label(row, text="Видео файл:").pack(side=tk.LEFT)
+        self.comp_crf_input_var = tk.StringVar()
+        ttk.Entry(row, textvariable=self.comp_crf_input_var, width=60).pack(side=tk.LEFT, padx=6)
+        ttk.Button(row, text="Обзор", command=self.comp_crf_browse).pack(side=tk.LEFT)
+        ttk.Button(row, text="Превью", command=lambda: self.show_preview(self.comp_crf_input_var)).pack(side=tk.LEFT, padx=4)
+
+        row2 = ttk.Frame(f)
+        row2.pack(fill=tk.X, padx=12, pady=pady)
+        ttk.Label(row2, text="Желаемый размер (МБ):").pack(side=tk.LEFT)
+        self.comp_crf_size_var = tk.StringVar(value="10")
+        ttk.Entry(row2, textvariable=self.comp_crf_size_var, width=10).pack(side=tk.LEFT, padx=6)
+
+        ttk.Label(row2, text="Аудио-битрейт (по умолчанию 128):").pack(side=tk.LEFT, padx=12)
+        self.comp_crf_audio_var = tk.StringVar(value="128")
+        ttk.Entry(row2, textvariable=self.comp_crf_audio_var, width=6).pack(side=tk.LEFT)
+
+        row3 = ttk.Frame(f)
+        row3.pack(fill=tk.X, padx=12, pady=pady)
+        self.comp_crf_btn = ttk.Button(row3, text="Сжать", command=self.start_compression_crf)
+        self.comp_crf_btn.pack(side=tk.LEFT)
+
+        ttk.Label(row3, text="   (CRF подбирается по коротким пробам, один проход)").pack(side=tk.LEFT)
+
+    def _build_sound_tab(self):
+        f = self.sound_frame
+        padx = 8; pady = 6
+
+        row = ttk.Frame(f)
+        row.pack(fill=tk.X, padx=12, pady=pady)
+        ttk.Label(row, text="Аудио файл:").pack(side=tk.LEFT)
+        self.sound_input_var = tk.StringVar()
+        ttk.Entry(row, textvariable=self.sound_input_var, width=60).pack(side=tk.LEFT, padx=6)
+        ttk.Button(row, text="Обзор", command=self.sound_browse).pack(side=tk.LEFT)
+
+        row_ext = ttk.Frame(f)
+        row_ext.pack(fill=tk.X, padx=12, pady=pady)
+        ttk.Label(row_ext, text="Выходное расширение (mp3, wav, flac, aac, ogg):").pack(side=tk.LEFT)
+        self.sound_ext_var = tk.StringVar(value="mp3")
+        ttk.Entry(row_ext, textvariable=self.sound_ext_var, width=10).pack(side=tk.LEFT, padx=6)
+
+        params_frame = ttk.Frame(f)
+        params_frame.pack(fill=tk.X, padx=12, pady=pady)
+
+        ttk.Label(params_frame, text="Скорость (tempo, 0.25-4.0):").grid(row=0, column=0, sticky=tk.W)
+        self.sound_speed_var = tk.DoubleVar(value=1.0)
+        ttk.Scale(params_frame, from_=0.25, to=4.0, variable=self.sound_speed_var, orient=tk.HORIZONTAL).grid(row=0, column=1, sticky=tk.EW, padx=6)
+        self._add_small_entry(params_frame, self.sound_speed_var, 0, 2)
+
+        ttk.Label(params_frame, text="Басс (dB, -20..+20):").grid(row=1, column=0, sticky=tk.W)
+        self.sound_bass_var = tk.IntVar(value=0)
+        ttk.Scale(params_frame, from_=-20, to=20, variable=self.sound_bass_var, orient=tk.HORIZONTAL).grid(row=1, column=1, sticky=tk.EW, padx=6)
+        self._add_small_entry(params_frame, self.sound_bass_var, 1, 2)
+
+        ttk.Label(params_frame, text="Требл (dB, -20..+20):").grid(row=2, column=0, sticky=tk.W)
+        self.sound_treble_var = tk.IntVar(value=0)
+        ttk.Scale(params_frame, from_=-20, to=20, variable=self.sound_treble_var, orient=tk.HORIZONTAL).grid(row=2, column=1, sticky=tk.EW, padx=6)
+        self._add_small_entry(params_frame, self.sound_treble_var, 2, 2)
+
+        ttk.Label(params_frame, text="Гейн (dB, -20..+20):").grid(row=3, column=0, sticky=tk.W)
+        self.sound_gain_var = tk.IntVar(value=0)
+        ttk.Scale(params_frame, from_=-20, to=20, variable=self.sound_gain_var, orient=tk.HORIZONTAL).grid(row=3, column=1, sticky=tk.EW, padx=6)
+        self._add_small_entry(params_frame, self.sound_gain_var, 3, 2)
+
+        ttk.Label(params_frame, text="Аудио-битрейт (кбит/с, 32-320):").grid(row=4, column=0, sticky=tk.W)
+        self.sound_bitrate_var = tk.IntVar(value=192)
+        bitrate_entry = ttk.Entry(params_frame, width=8, textvariable=self.sound_bitrate_var)
+        bitrate_entry.grid(row=4, column=1, sticky=tk.W, padx=6)
+
+        self.sound_normalize_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(params_frame, text="Нормализовать громкость (EBU R128, -16 LUFS)",
+                        variable=self.sound_normalize_var).grid(row=5, column=0, columnspan=2, sticky=tk.W)
+
+        params_frame.columnconfigure(1, weight=1)
+
+        # info and buttons
+        #row2 = ttk.Frame(f)
+        #row2.pack(fill=tk.X, padx=12, pady=pady)
+        #self.sound_info_label = ttk.Label(row2, text="Длительность: —")
+        #self.sound_info_label.pack(side=tk.LEFT)
+        #ttk.Button(row2, text="Обновить инфо", command=self.update_sound_info).pack(side=tk.LEFT, padx=8)
+
+        row_prev = ttk.Frame(f)
+        row_prev.pack(fill=tk.X, padx=12, pady=pady)
+        ttk.Label(row_prev, text="Фрагмент с (сек):").pack(side=tk.LEFT)
+        self.sound_prev_start_var = tk.DoubleVar(value=0.0)
+        ttk.Entry(row_prev, textvariable=self.sound_prev_start_var, width=8).pack(side=tk.LEFT, padx=6)
+        ttk.Button(row_prev, text="Прослушать", command=lambda: self.start_sound_preview(False)).pack(side=tk.LEFT)
+        ttk.Button(row_prev, text="Сохранить фрагмент", command=lambda: self.start_sound_preview(True)).pack(side=tk.LEFT, padx=6)
+        ttk.Label(row_prev, text=f"   ({PREVIEW_SEC:g} сек, декодируется один раз)").pack(side=tk.LEFT)
+
+        row3 = ttk.Frame(f)
+        row3.pack(fill=tk.X, padx=12, pady=pady)
+        self.sound_apply_btn = ttk.Button(row3, text="Применить изменения и сохранить", command=self.start_sound_processing)
+        self.sound_apply_btn.pack(side=tk.LEFT)
+
+        ttk.Label(row3, text="   (создаст новый аудиофайл в папке saves)").pack(side=tk.LEFT)
+
+    def _add_small_entry(self, parent, var, r, c):
+        # small entry next to scale to show numeric value
+        e = ttk.Entry(parent, width=6, textvariable=var)
+        e.grid(row=r, column=c, sticky=tk.E)
+
+    def conv_browse(self):
+        p = filedialog.askopenfilename(title="Выберите файл для конвертации")
+        if p:
+            self.conv_input_var.set(p)
+
+    def conv_browse_dir(self):
+        p = filedialog.askdirectory(title="Выберите папку с изображениями")
+        if p:
+            self.conv_input_var.set(p)
+
+    def comp_prec_browse(self):
+        p = filedialog.askopenfilename(title="Выберите видео для сжатия (точное)")
+        if p:
+            self.comp_prec_input_var.set(p)
+
+    def comp_fast_browse(self):
+        p = filedialog.askopenfilename(title="Выберите видео для сжатия (быстрое)")
+        if p:
+            self.comp_fast_input_var.set(p)
+
+    def comp_crf_browse(self):
+        p = filedialog.askopenfilename(title="Выберите видео для сжатия (CRF)")
+        if p:
+            self.comp_crf_input_var.set(p)
+
+    def sound_browse(self):
+        p = filedialog.askopenfilename(
+            title="Выберите аудио файл",
+            filetypes=[("Аудио файлы", "*.mp3 *.wav *.ogg *.aac *.flac" )]
+        )
+        if p:
+            self.sound_input_var.set(p)
+            
+    def start_conversion(self):
+        input_path = self.conv_input_var.get().strip()
+        ext = self.conv_ext_var.get().strip().lstrip('.')
+        if not input_path or not ext:
+            messagebox.showerror("Ошибка", "Выберите файл и укажите выходное расширение")
+            return
+        start = self.conv_start_var.get().strip()
+        end = self.conv_end_var.get().strip()
+        if bool(start) != bool(end):
+            messagebox.showerror("Ошибка", "Укажите и начало, и конец фрагмента")
+            return
+        self.conv_btn.configure(state=tk.DISABLED)
+        if start:
+            thread = threading.Thread(target=self._trim_worker, args=(input_path, start, end, ext), daemon=True)
+            thread.start()
+            return
+        if os.path.isdir(input_path) or any(c in input_path for c in '*?['):
+            # a folder or a pattern: all images in one batch
+            thread = threading.Thread(target=self._images_worker, args=(input_path, ext), daemon=True)
+            thread.start()
+            return
+        segmented = self.conv_segmented_var.get()
+        thread = threading.Thread(target=self._conversion_worker, args=(input_path, ext, segmented), daemon=True)
+        thread.start()
+
+    def _conversion_worker(self, input_path, ext, segmented=False):
+        params = {'ext': ext, 'segmented': segmented}
+        self._run_job('convert', convert, input_path, params, self.conv_btn)
+
+    def _images_worker(self, input_path, ext):
+        self._run_job('images', convert_images, input_path, {'ext': ext}, self.conv_btn)
+
+    def _trim_worker(self, input_path, start, end, ext):
+        params = {'start': start, 'end': end, 'ext': ext}
+        self._run_job('trim', trim, input_path, params, self.conv_btn)
+
+    def start_compression_precise(self):
+        input_path = self.comp_prec_input_var.get().strip()
+        size_mb = self.comp_prec_size_var.get().strip()
+        audio_kbit = self.comp_prec_audio_var.get().strip()
+        if not input_path:
+            messagebox.showerror("Ошибка", "Выберите видеофайл для сжатия")
+            return
+        try:
+            size_mb = float(size_mb)
+            audio_kbit = int(audio_kbit)
+        except Exception:
+            messagebox.showerror("Ошибка", "Неверное значение размера или аудио-битрейта")
+            return
+        self.comp_prec_btn.configure(state=tk.DISABLED)
+        first_pass = 'fast' if self.comp_prec_fast_pass_var.get() else 'default'
+        thread = threading.Thread(target=self._compression_worker_precise, args=(input_path, size_mb, audio_kbit, first_pass), daemon=True)
+        thread.start()
+
+    def _compression_worker_precise(self, input_path, size_mb, audio_kbit, first_pass='fast'):
+        params = {'size_mb': size_mb, 'audio_kbit': audio_kbit, 'first_pass': first_pass}
+        self._run_job('compress_precise', compress_precise, input_path, params, self.comp_prec_btn)
+
+    def start_compression_fast(self):
+        input_path = self.comp_fast_input_var.get().strip()
+        size_mb = self.comp_fast_size_var.get().strip()
+        audio_kbit = self.comp_fast_audio_var.get().strip()
+        if not input_path:
+            messagebox.showerror("Ошибка", "Выберите видеофайл для сжатия")
+            return
+        try:
+            size_mb = float(size_mb)
+            audio_kbit = int(audio_kbit)
+        except Exception:
+            messagebox.showerror("Ошибка", "Неверное значение размера или аудио-битрейта")
+            return
+        self.comp_fast_btn.configure(state=tk.DISABLED)
+        segmented = self.comp_fast_segmented_var.get()
+        thread = threading.Thread(target=self._compression_worker_fast, args=(input_path, size_mb, audio_kbit, segmented), daemon=True)
+        thread.start()
+
+    def _compression_worker_fast(self, input_path, size_mb, audio_kbit, segmented=False):
+        params = {'size_mb': size_mb, 'audio_kbit': audio_kbit, 'segmented': segmented}
+        self._run_job('compress_fast', compress_fast, input_path, params, self.comp_fast_btn)
+
+    def start_compression_crf(self):
+        input_path = self.comp_crf_input_var.get().strip()
+        size_mb = self.comp_crf_size_var.get().strip()
+        audio_kbit = self.comp_crf_audio_var.get().strip()
+        if not input_path:
+            messagebox.showerror("Ошибка", "Выберите видеофайл для сжатия")
+            return
+        try:
+            size_mb = float(size_mb)
+            audio_kbit = int(audio_kbit)
+        except Exception:
+            messagebox.showerror("Ошибка", "Неверное значение размера или аудио-битрейта")
+            return
+        self.comp_crf_btn.configure(state=tk.DISABLED)
+        thread = threading.Thread(target=self._compression_worker_crf, args=(input_path, size_mb, audio_kbit), daemon=True)
+        thread.start()
+
+    def _compression_worker_crf(self, input_path, size_mb, audio_kbit):
+        params = {'size_mb': size_mb, 'audio_kbit': audio_kbit}
+        self._run_job('compress_crf', compress_crf, input_path, params, self.comp_crf_btn)
+
+    def start_sound_processing(self):
+        input_path = self.sound_input_var.get().strip()
+        if not input_path:
+            messagebox.showerror("Ошибка", "Выберите аудио файл")
+            return
+        ext = self.sound_ext_var.get().strip().lstrip('.').lower()
+        if not ext:
+            messagebox.showerror("Ошибка", "Укажите выходное расширение")
+            return
+        try:
+            speed = float(self.sound_speed_var.get())
+            bass = int(self.sound_bass_var.get())
+            treble = int(self.sound_treble_var.get())
+            gain = int(self.sound_gain_var.get())
+            bitrate = int(self.sound_bitrate_var.get())
+        except Exception:
+            messagebox.showerror("Ошибка", "Неверные параметры")
+            return
+
+        self.sound_apply_btn.configure(state=tk.DISABLED)
+        normalize = self.sound_normalize_var.get()
+        thread = threading.Thread(target=self._sound_worker, args=(input_path, ext, speed, bass, treble, gain, bitrate, normalize), daemon=True)
+        thread.start()
+
+    def start_sound_preview(self, save):
+        input_path = self.sound_input_var.get().strip()
+        if not input_path:
+            messagebox.showerror("Ошибка", "Выберите аудио файл")
+            return
+        try:
+            params = {'start': float(self.sound_prev_start_var.get()),
+                      'speed': float(self.sound_speed_var.get()),
+                      'bass': int(self.sound_bass_var.get()),
+                      'treble': int(self.sound_treble_var.get()),
+                      'gain': int(self.sound_gain_var.get()),
+                      'normalize': self.sound_normalize_var.get()}
+        except Exception:
+            messagebox.showerror("Ошибка", "Неверные параметры")
+            return
+        thread = threading.Thread(target=audition, args=(input_path,), kwargs=dict(params, save=save, write_log=self.write_log), daemon=True)
+        thread.start()
+
+    def _sound_worker(self, input_path, ext, speed, bass, treble, gain, bitrate, normalize=False):
+        params = {'ext': ext, 'speed': speed, 'bass': bass, 'treble': treble, 'gain': gain, 'bitrate': bitrate,
+                  'normalize': normalize}
+        self._run_job('sound', process_sound, input_path, params, self.sound_apply_btn)
+
+
+def run():
+    app = App()
+    app.mainloop()
+    return 0
@@ -0,0 +1,169 @@
+import os
+import sys
+import glob
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from workers import (FFMPEG_BIN, SAVES_DIR, IMG_EXTS, unique_path, partial_path, run_subprocess, noop_log,
+                     current_limits, use_limits, current_metrics, use_metrics)
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# bulk image conversion without one ffmpeg launch per file: with Pillow the
+# images are converted in-process by a process pool, without it each ffmpeg
+# run takes a whole chunk of images (N inputs -> N outputs in one process)
+
+CHUNK_FILES = 64
+# formats Pillow writes; anything else goes through ffmpeg
+PIL_FORMATS = {'png': 'PNG', 'jpg': 'JPEG', 'jpeg': 'JPEG', 'webp': 'WEBP', 'bmp': 'BMP', 'tiff': 'TIFF', 'gif': 'GIF'}
+NO_ALPHA = {'JPEG', 'BMP'}
+
+
+def collect_images(source):
+    # a directory (not recursive) or a glob pattern
+    p = Path(source)
+    if p.is_dir():
+        files = [f for f in sorted(p.iterdir()) if f.is_file()]
+    else:
+        files = [Path(f) for f in sorted(glob.glob(str(source), recursive=True))]
+    return [f for f in files if f.suffix.lower() in IMG_EXTS]
+
+
+def _plan_outputs(files, ext, out_dir):
+    # unique_path reserves each name, so same-stem sources get _1, _2, ...
+    return [(f, unique_path(out_dir / f"{f.stem}.{ext}")) for f in files]
+
+
+def _pil_convert(pair):
+    src, out = pair
+    fmt = PIL_FORMATS[out.suffix.lstrip('.').lower()]
+    part = partial_path(out)
+    try:
+        with Image.open(src) as im:
+            if fmt in NO_ALPHA and im.mode not in ('RGB', 'L'):
+                im = im.convert('RGB')
+            im.save(part, fmt)
+        os.replace(part, out)
+        return out
+    except Exception:
+        try:
+            part.unlink()
+        except OSError:
+            pass
+        return None
+
+
+def _ffmpeg_chunk(pairs, limits=None, metrics=None):
+    cmd = [FFMPEG_BIN, '-y']
+    for src, _ in pairs:
+        cmd += ['-i', str(src)]
+    for i, (_, out) in enumerate(pairs):
+        cmd += ['-map', f"{i}:v:0", '-frames:v', '1', str(partial_path(out))]
+    with use_limits(limits), use_metrics(metrics):
+        rc = run_subprocess(cmd)
+    if rc != 0 and len(pairs) > 1:
+        # one unreadable file fails the whole run: redo this chunk file by file
+        for _, out in pairs:
+            try:
+                partial_path(out).unlink()
+            except OSError:
+                pass
+        return [o for pair in pairs for o in _ffmpeg_chunk([pair], limits, metrics)]
+    done = []
+    for _, out in pairs:
+        part = partial_path(out)
+        if rc == 0 and part.exists():
+            os.replace(part, out)
+            done.append(out)
+        else:
+            done.append(None)
+            try:
+                part.unlink()
+            except OSError:
+                pass
+    return done
+
+
+def _progress(done, total, started):
+    elapsed = max(time.time() - started, 1e-6)
+    rate = done / elapsed
+    return {'frame': done, 'fps': rate, 'speed': None, 'out_time': elapsed, 'total_size': 0,
+            'percent': done / total * 100 if total else 100.0,
+            'eta': (total - done) / rate if rate else None, 'done': done == total}
+
+
+def convert_images(input_path, ext, out_dir=None, workers=None, engine='auto', write_log=None, on_progress=None):
+    write_log = write_log or noop_log
+    ext = ext.strip().lstrip('.').lower()
+    files = collect_images(input_path)
+    if not files:
+        write_log(f"Изображения не найдены: {input_path}")
+        return (2, None)
+    out_dir = Path(out_dir) if out_dir else SAVES_DIR
+    out_dir.mkdir(parents=True, exist_ok=True)
+    limits = current_limits()
+    metrics = current_metrics()
+    if not workers and limits and limits.cpus:
+        workers = len(limits.cpus)
+    workers = workers or os.cpu_count() or 1
+    pairs = _plan_outputs(files, ext, out_dir)
+
+    use_pil = engine == 'pil' or (engine == 'auto' and Image is not None and ext in PIL_FORMATS)
+    if use_pil and (Image is None or ext not in PIL_FORMATS):
+        write_log("Pillow недоступен для этого формата — используем ffmpeg")
+        use_pil = False
+    write_log(f"Изображений: {len(files)}, движок: {'Pillow' if use_pil else 'ffmpeg'}, параллельно: {workers}")
+
+    started = time.time()
+    outputs = []
+    if use_pil:
+        chunksize = max(1, min(CHUNK_FILES, len(pairs) // (workers * 4)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for out in pool.map(_pil_convert, pairs, chunksize=chunksize):
+                outputs.append(out)
+                if on_progress and len(outputs) % CHUNK_FILES == 0:
+                    on_progress(_progress(len(outputs), len(pairs), started))
+    else:
+        # spread the files over the workers, but never more than CHUNK_FILES inputs per process
+        size = max(1, min(CHUNK_FILES, -(-len(pairs) // workers)))
+        chunks = [pairs[i:i + size] for i in range(0, len(pairs), size)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for done in pool.map(lambda chunk: _ffmpeg_chunk(chunk, limits, metrics), chunks):
+                outputs.extend(done)
+                if on_progress:
+                    on_progress(_progress(len(outputs), len(pairs), started))
+
+    elapsed = max(time.time() - started, 1e-6)
+    ok = [o for o in outputs if o]
+    failed = [src.name for (src, _), o in zip(pairs, outputs) if not o]
+    write_log(f"Готово: {len(ok)}/{len(pairs)} за {elapsed:.1f} с ({len(ok) / elapsed:.1f} файлов/с)")
+    if failed:
+        write_log(f"Не сконвертированы: {', '.join(failed[:20])}{' …' if len(failed) > 20 else ''}")
+    if on_progress:
+        on_progress(_progress(len(outputs), len(pairs), started))
+    return (0 if not failed else 1, ok)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетная конвертация изображений")
+    parser.add_argument('input', help="каталог или шаблон, например 'photos/*.png'")
+    parser.add_argument('ext', help="выходной формат, например jpg")
+    parser.add_argument('-o', '--out-dir', help="куда сохранять (по умолчанию saves)")
+    parser.add_argument('-j', '--jobs', type=int, default=None)
+    parser.add_argument('--engine', choices=('auto', 'pil', 'ffmpeg'), default='auto')
+    args = parser.parse_args(argv)
+
+    def log(text):
+        print(text, file=sys.stderr)
+
+    rc, _ = convert_images(args.input, args.ext, out_dir=args.out_dir, workers=args.jobs, engine=args.engine, write_log=log)
+    return rc
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+
+from workers import ROOT
+from probe import file_identity
+
+# persistent job queue next to saves/: queued -> running -> done | failed.
+# Jobs left 'running' by a process that is gone (crash, app closed) go back
+# to 'queued' on the next start; 'done' jobs are never picked up again.
+# Each job records who queued it (gui, batch, watch): the GUI shares the file
+# with the command-line tools; each of them recovers and claims only its own.
+
+QUEUE_DB = ROOT / "jobs.sqlite"
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def _input_stamp(path):
+    # size + mtime, so a replaced source is a new job; globs (image batches) have none
+    try:
+        return list(file_identity(path)[1:])
+    except OSError:
+        return None
+
+
+def job_signature(job):
+    params = {k: v for k, v in job.items() if k not in ('type', 'input', 'use_cache')}
+    payload = json.dumps([job['type'], os.path.abspath(job['input']), _input_stamp(job['input']), params],
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _process_stamp(pid):
+    # boot id + start time (clock ticks since boot) of the process; unlike the pid
+    # alone it can't belong to another process after a restart. None off Linux
+    try:
+        with open('/proc/sys/kernel/random/boot_id', encoding='ascii') as fh:
+            boot_id = fh.read().strip()
+        with open(f"/proc/{pid}/stat", encoding='ascii', errors='replace') as fh:
+            # the command name in parentheses may contain spaces
+            fields = fh.read().rsplit(')', 1)[1].split()
+        return f"{boot_id}:{fields[19]}"
+    except (OSError, IndexError):
+        return None
+
+
+def _pid_alive(pid, stamp=None):
+    if not pid:
+        return False
+    if stamp:
+        return _process_stamp(pid) == stamp
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return os.name != 'nt'
+    return True
+
+
+class JobQueue:
+    def __init__(self, path=QUEUE_DB):
+        self.path = str(path)
+        con = self._connect()
+        try:
+            con.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                signature TEXT,
+                job TEXT,
+                state TEXT,
+                rc INTEGER,
+                output TEXT,
+                error TEXT,
+                pid INTEGER,
+                attempts INTEGER DEFAULT 0,
+                created REAL,
+                started REAL,
+                finished REAL)""")
+            columns = [c[1] for c in con.execute("PRAGMA table_info(jobs)")]
+            for name in ('owner', 'pid_stamp'):
+                if name not in columns:
+                    con.execute(f"ALTER TABLE jobs ADD COLUMN {name} TEXT")
+            con.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state)")
+            con.execute("CREATE INDEX IF NOT EXISTS jobs_signature ON jobs (signature)")
+            con.commit()
+        finally:
+            con.close()
+
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        con.execute("PRAGMA journal_mode=WAL")
+        return con
+
+    def add(self, job, state=QUEUED, owner=None):
+        # the same job (type + input as it is on disk + params) is only queued once while it's pending or done;
+        # failed jobs are queued again
+        sig = job_signature(job)
+        con = self._connect()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            row = con.execute("SELECT id FROM jobs WHERE signature = ? AND state IN (?, ?, ?) ORDER BY id DESC LIMIT 1",
+                              (sig, QUEUED, RUNNING, DONE)).fetchone()
+            if row and state == QUEUED:
+                con.execute("COMMIT")
+                return row[0], False
+            now = time.time()
+            pid = os.getpid() if state == RUNNING else None
+            cur = con.execute("INSERT INTO jobs (signature, job, state, pid, pid_stamp, attempts, created, started, owner) "
+                              "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                              (sig, json.dumps(job), state, pid, pid and _process_stamp(pid),
+                               1 if state == RUNNING else 0, now, now if state == RUNNING else None, owner))
+            con.execute("COMMIT")
+            return cur.lastrowid, True
+        finally:
+            con.close()
+
+    def recover(self, owner=None):
+        # owner=None requeues every stale job
+        con = self._connect()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            if owner is None:
+                rows = con.execute("SELECT id, pid, pid_stamp FROM jobs WHERE state = ?", (RUNNING,)).fetchall()
+            else:
+                rows = con.execute("SELECT id, pid, pid_stamp FROM jobs WHERE state = ? AND owner = ?",
+                                   (RUNNING, owner)).fetchall()
+            # a reused pid (after a reboot, say) doesn't keep a job 'running': the stamp won't match
+            stale = [job_id for job_id, pid, stamp in rows if not _pid_alive(pid, stamp)]
+            for job_id in stale:
+                con.execute("UPDATE jobs SET state = ?, pid = NULL, pid_stamp = NULL WHERE id = ?", (QUEUED, job_id))
+            con.execute("COMMIT")
+            return len(stale)
+        finally:
+            con.close()
+
+    def claim(self, owner=None):
+        # owner=None takes any queued job
+        con = self._connect()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            if owner is None:
+                row = con.execute("SELECT id, job FROM jobs WHERE state = ? ORDER BY id LIMIT 1", (QUEUED,)).fetchone()
+            else:
+                row = con.execute("SELECT id, job FROM jobs WHERE state = ? AND owner = ? ORDER BY id LIMIT 1",
+                                  (QUEUED, owner)).fetchone()
+            if row is None:
+                con.execute("COMMIT")
+                return None
+            con.execute("UPDATE jobs SET state = ?, pid = ?, pid_stamp = ?, attempts = attempts + 1, started = ? WHERE id = ?",
+                        (RUNNING, os.getpid(), _process_stamp(os.getpid()), time.time(), row[0]))
+            con.execute("COMMIT")
+            return row[0], json.loads(row[1])
+        finally:
+            con.close()
+
+    def finish(self, job_id, rc, output=None, error=None):
+        state = DONE if rc == 0 else FAILED
+        con = self._connect()
+        try:
+            con.execute("UPDATE jobs SET state = ?, rc = ?, output = ?, error = ?, finished = ? WHERE id = ?",
+                        (state, rc, json.dumps(output, default=str), error, time.time(), job_id))
+        finally:
+            con.close()
+
+    def counts(self, owner=None):
+        con = self._connect()
+        try:
+            if owner is None:
+                return dict(con.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+            return dict(con.execute("SELECT state, COUNT(*) FROM jobs WHERE owner = ? GROUP BY state", (owner,)).fetchall())
+        finally:
+            con.close()
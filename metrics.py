@@ -0,0 +1,167 @@
+import os
+import sys
+import glob
+import json
+import time
+import socket
+import argparse
+from pathlib import Path
+
+from workers import CACHE_DIR, JobMetrics, use_metrics
+
+# per-job cost: wall time, CPU time and peak RSS of the ffmpeg children (rusage),
+# encode fps/speed from -progress, bytes in and out. One JSON object per line in
+# cache/metrics.jsonl; the Prometheus export sums them up per job type for the
+# node_exporter textfile collector.
+
+METRICS_LOG = CACHE_DIR / "metrics.jsonl"
+PROM_PREFIX = 'vcc'
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def bytes_in(input_path):
+    p = Path(input_path)
+    if p.is_file():
+        return _size(p)
+    if p.is_dir():
+        return sum(_size(f) for f in p.iterdir() if f.is_file())
+    # image batch given as a glob
+    return sum(_size(f) for f in glob.glob(str(input_path), recursive=True))
+
+
+def bytes_out(output):
+    if not output:
+        return 0
+    if isinstance(output, (list, tuple)):
+        return sum(_size(p) for p in output if p)
+    return _size(output)
+
+
+def job_record(kind, input_path, rc, output, metrics, wall, started):
+    rec = {'type': kind, 'input': str(input_path), 'rc': rc, 'started': round(started, 3),
+           'host': socket.gethostname(), 'wall': round(wall, 3)}
+    rec.update(metrics.as_dict())
+    rec['cpu'] = round(rec['cpu_user'] + rec['cpu_system'], 3)
+    rec['bytes_in'] = bytes_in(input_path)
+    rec['bytes_out'] = bytes_out(output)
+    return rec
+
+
+def run_measured(kind, func, input_path, *args, metrics_path=METRICS_LOG, **kwargs):
+    # -> ((rc, output), record); the record is also appended to metrics_path
+    metrics = JobMetrics()
+    started = time.time()
+    t0 = time.monotonic()
+    with use_metrics(metrics):
+        rc, output = func(input_path, *args, **kwargs)
+    rec = job_record(kind, input_path, rc, output, metrics, time.monotonic() - t0, started)
+    if metrics_path:
+        append_record(rec, metrics_path)
+    return (rc, output), rec
+
+
+def append_record(rec, path=METRICS_LOG):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # one write per line: parallel batch processes append to the same file
+    with open(path, 'a', encoding='utf-8') as fh:
+        fh.write(json.dumps(rec, ensure_ascii=False) + '\n')
+
+
+def load_records(path=METRICS_LOG):
+    records = []
+    try:
+        with open(path, encoding='utf-8') as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # a line cut short by a crash
+                    continue
+    except OSError:
+        pass
+    return records
+
+
+def _prom_value(v):
+    return f"{v:.6g}" if isinstance(v, float) else str(v)
+
+
+def prometheus_text(records):
+    by_type = {}
+    for r in records:
+        t = by_type.setdefault(r.get('type') or 'unknown', {
+            'ok': 0, 'failed': 0, 'wall': 0.0, 'cpu': 0.0, 'bytes_in': 0, 'bytes_out': 0,
+            'peak_rss': 0, 'fps': None, 'speed': None, 'last': 0.0})
+        t['ok' if r.get('rc') == 0 else 'failed'] += 1
+        t['wall'] += r.get('wall') or 0.0
+        t['cpu'] += r.get('cpu') or 0.0
+        t['bytes_in'] += r.get('bytes_in') or 0
+        t['bytes_out'] += r.get('bytes_out') or 0
+        t['peak_rss'] = max(t['peak_rss'], r.get('peak_rss') or 0)
+        if (r.get('started') or 0) >= t['last'] and r.get('fps'):
+            t['last'] = r['started']
+            t['fps'] = r['fps']
+            t['speed'] = r.get('speed')
+
+    series = [
+        ('jobs_total', 'counter', "Finished jobs", lambda t: None),
+        ('job_wall_seconds_total', 'counter', "Wall time of finished jobs", lambda t: t['wall']),
+        ('job_cpu_seconds_total', 'counter', "CPU time (user + system) of the ffmpeg processes", lambda t: t['cpu']),
+        ('job_bytes_in_total', 'counter', "Input bytes", lambda t: t['bytes_in']),
+        ('job_bytes_out_total', 'counter', "Output bytes", lambda t: t['bytes_out']),
+        ('job_peak_rss_bytes', 'gauge', "Largest peak RSS of one ffmpeg process", lambda t: t['peak_rss']),
+        ('job_last_fps', 'gauge', "Encode fps of the latest job", lambda t: t['fps']),
+        ('job_last_speed', 'gauge', "Encode speed (x realtime) of the latest job", lambda t: t['speed']),
+    ]
+    lines = []
+    for name, mtype, help_text, get in series:
+        full = f"{PROM_PREFIX}_{name}"
+        lines.append(f"# HELP {full} {help_text}")
+        lines.append(f"# TYPE {full} {mtype}")
+        for kind in sorted(by_type):
+            t = by_type[kind]
+            if name == 'jobs_total':
+                lines.append(f'{full}{{type="{kind}",status="ok"}} {t["ok"]}')
+                lines.append(f'{full}{{type="{kind}",status="failed"}} {t["failed"]}')
+                continue
+            value = get(t)
+            if value is not None:
+                lines.append(f'{full}{{type="{kind}"}} {_prom_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus(records, path):
+    # the collector may read at any moment: write aside, then rename
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(prometheus_text(records), encoding='utf-8')
+    os.replace(tmp, path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Метрики заданий: экспорт для Prometheus")
+    parser.add_argument('--metrics', default=str(METRICS_LOG), help="JSON lines с метриками заданий")
+    parser.add_argument('--prom', required=True, help="куда записать файл для textfile collector (*.prom)")
+    args = parser.parse_args(argv)
+    records = load_records(args.metrics)
+    if not records:
+        print(f"Нет записей в {args.metrics}", file=sys.stderr)
+        return 1
+    print(write_prometheus(records, args.prom))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import os
+import sys
+import shutil
+import hashlib
+import argparse
+import tempfile
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from workers import FFMPEG_BIN, CACHE_DIR, run_subprocess, noop_log
+from probe import probe_media, file_identity
+
+# quick look at a file: contact sheet + low-res proxy clip. Every frame is one
+# short ffmpeg run that seeks straight to the keyframe before a timestamp and
+# decodes keyframes only (-skip_frame nokey), so the cost doesn't depend on the
+# file size; the runs go in parallel. Results live in cache/previews.
+
+PREVIEW_DIR = CACHE_DIR / "previews"
+SHEET_COLS = 4
+SHEET_ROWS = 4
+TILE_WIDTH = 320
+PROXY_FRAMES = 48
+PROXY_FPS = 4
+PROXY_WIDTH = 480
+
+
+def _cache_path(path, name):
+    ident = '|'.join(str(x) for x in file_identity(path))
+    key = hashlib.sha1(f"{ident}|{name}".encode()).hexdigest()
+    return PREVIEW_DIR / f"{key}_{name}"
+
+
+def sample_times(duration, count):
+    # middles of equal slices: no black first frame, no end credits
+    return [duration * (i + 0.5) / count for i in range(count)]
+
+
+def grab_keyframe(inp, t, width, out):
+    cmd = [FFMPEG_BIN, '-y', '-skip_frame', 'nokey', '-noaccurate_seek', '-ss', f"{t:.3f}", '-i', str(inp),
+           '-map', '0:v:0', '-frames:v', '1', '-vf', f"scale={width}:-2", '-q:v', '3', str(out)]
+    rc = run_subprocess(cmd)
+    return out if rc == 0 and out.exists() else None
+
+
+def _grab_all(inp, times, width, tmp):
+    with ThreadPoolExecutor(max_workers=min(len(times), (os.cpu_count() or 1) * 2)) as pool:
+        frames = list(pool.map(lambda it: grab_keyframe(inp, it[1], width, tmp / f"raw_{it[0]:04d}.jpg"),
+                               enumerate(times)))
+    # the image2 demuxer wants an unbroken sequence
+    got = [f for f in frames if f]
+    for i, f in enumerate(got):
+        f.rename(tmp / f"f_{i:04d}.jpg")
+    return len(got)
+
+
+def _build(input_path, name, count, width, assemble, write_log):
+    inp = Path(input_path)
+    if not inp.exists():
+        write_log(f"Файл не найден: {input_path}")
+        return None
+    out = _cache_path(inp, name)
+    if out.exists():
+        return out
+    info = probe_media(inp)
+    if not info or not info.get('video') or not info.get('duration'):
+        write_log("Превью: нет видеопотока или длительности")
+        return None
+
+    PREVIEW_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix='prev_', dir=PREVIEW_DIR))
+    try:
+        got = _grab_all(inp, sample_times(info['duration'], count), width, tmp)
+        if not got:
+            write_log("Превью: не удалось получить ни одного кадра")
+            return None
+        part = tmp / f"out{out.suffix}"
+        rc = run_subprocess(assemble(tmp / 'f_%04d.jpg', part), write_log=write_log)
+        if rc != 0 or not part.exists():
+            write_log("Превью: не удалось собрать результат")
+            return None
+        os.replace(part, out)
+        return out
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def contact_sheet(input_path, cols=SHEET_COLS, rows=SHEET_ROWS, width=TILE_WIDTH, write_log=None):
+    def assemble(pattern, out):
+        # png: Tk shows it without extra libraries
+        return [FFMPEG_BIN, '-y', '-framerate', '1', '-i', str(pattern),
+                '-vf', f"tile={cols}x{rows}:padding=4:margin=4", '-frames:v', '1', str(out)]
+    return _build(input_path, f"sheet_{cols}x{rows}_{width}.png", cols * rows, width, assemble,
+                  write_log or noop_log)
+
+
+def proxy_clip(input_path, frames=PROXY_FRAMES, fps=PROXY_FPS, width=PROXY_WIDTH, write_log=None):
+    def assemble(pattern, out):
+        return [FFMPEG_BIN, '-y', '-framerate', str(fps), '-i', str(pattern), '-c:v', 'libx264',
+                '-preset', 'ultrafast', '-crf', '30', '-pix_fmt', 'yuv420p', str(out)]
+    return _build(input_path, f"proxy_{frames}_{fps}_{width}.mp4", frames, width, assemble,
+                  write_log or noop_log)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Контактный лист и превью-ролик по ключевым кадрам")
+    parser.add_argument('input')
+    parser.add_argument('--cols', type=int, default=SHEET_COLS)
+    parser.add_argument('--rows', type=int, default=SHEET_ROWS)
+    parser.add_argument('--proxy', action='store_true', help="собрать также превью-ролик")
+    args = parser.parse_args(argv)
+
+    def log(text):
+        print(text, file=sys.stderr)
+
+    sheet = contact_sheet(args.input, cols=args.cols, rows=args.rows, write_log=log)
+    if not sheet:
+        return 1
+    print(sheet)
+    if args.proxy:
+        clip = proxy_clip(args.input, write_log=log)
+        if not clip:
+            return 1
+        print(clip)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,226 @@
+import sys
+import json
+import time
+import sqlite3
+import threading
+import subprocess
+from pathlib import Path
+
+from workers import FFMPEG_BIN, FFPROBE_BIN, CACHE_DIR, LOUDNORM_TARGET
+
+# one ffprobe call per source (format + all streams as JSON), stored in
+# cache/probe.sqlite keyed by path and validated by size + mtime.
+# Keyframe index and loudness (EBU R128) are measured separately and only on request,
+# then stored in the same row.
+
+PROBE_DB = CACHE_DIR / "probe.sqlite"
+MAX_ENTRIES = 5000
+
+_lock = threading.Lock()
+_memo = {}
+
+
+def _connect():
+    CACHE_DIR.mkdir(exist_ok=True)
+    con = sqlite3.connect(str(PROBE_DB), timeout=30)
+    con.execute("CREATE TABLE IF NOT EXISTS probe (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, data TEXT, used REAL)")
+    return con
+
+
+def file_identity(path):
+    p = Path(path).resolve()
+    st = p.stat()
+    return str(p), st.st_size, st.st_mtime_ns
+
+
+def _rate(value):
+    try:
+        num, den = value.split('/')
+        return float(num) / float(den) if float(den) else None
+    except (AttributeError, ValueError):
+        return None
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _summarize(raw):
+    fmt = raw.get('format', {})
+    info = {
+        'format_name': fmt.get('format_name'),
+        'duration': _float(fmt.get('duration')),
+        'size': int(fmt['size']) if fmt.get('size') else None,
+        'bit_rate': int(fmt['bit_rate']) if fmt.get('bit_rate') else None,
+        'video': None,
+        'audio': None,
+        'streams': [],
+    }
+    for s in raw.get('streams', []):
+        kind = s.get('codec_type')
+        entry = {'index': s.get('index'), 'type': kind, 'codec': s.get('codec_name')}
+        if kind == 'video':
+            if (s.get('disposition') or {}).get('attached_pic'):
+                entry['attached_pic'] = True
+            entry.update({
+                'width': s.get('width'),
+                'height': s.get('height'),
+                'fps': _rate(s.get('avg_frame_rate')) or _rate(s.get('r_frame_rate')),
+                'pix_fmt': s.get('pix_fmt'),
+                'bit_rate': int(s['bit_rate']) if s.get('bit_rate') else None,
+            })
+            if info['video'] is None and not entry.get('attached_pic'):
+                info['video'] = entry
+        elif kind == 'audio':
+            entry.update({
+                'channels': s.get('channels'),
+                'channel_layout': s.get('channel_layout'),
+                'sample_rate': int(s['sample_rate']) if s.get('sample_rate') else None,
+                'bit_rate': int(s['bit_rate']) if s.get('bit_rate') else None,
+            })
+            if info['audio'] is None:
+                info['audio'] = entry
+        entry['language'] = (s.get('tags') or {}).get('language')
+        info['streams'].append(entry)
+    if info['duration'] is None and info['video']:
+        info['duration'] = _float(next((s.get('duration') for s in raw.get('streams', []) if s.get('codec_type') == 'video'), None))
+    return info
+
+
+def _run_ffprobe(path):
+    cmd = [FFPROBE_BIN, "-v", "error", "-show_format", "-show_streams", "-of", "json", str(path)]
+    out = subprocess.check_output(cmd, stderr=subprocess.DEVNULL, text=True)
+    return _summarize(json.loads(out))
+
+
+def _run_keyframes(path):
+    # packet flags come from the container index, nothing is decoded
+    cmd = [FFPROBE_BIN, "-v", "error", "-select_streams", "v:0", "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", str(path)]
+    out = subprocess.check_output(cmd, stderr=subprocess.DEVNULL, text=True)
+    times = []
+    for line in out.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) < 2 or 'K' not in parts[1]:
+            continue
+        try:
+            times.append(float(parts[0]))
+        except ValueError:
+            pass
+    return sorted(set(times))
+
+
+def _run_loudness(path, target):
+    # loudnorm analysis pass; the JSON block is the last thing it prints to stderr
+    af = f"loudnorm=I={target['I']}:TP={target['TP']}:LRA={target['LRA']}:print_format=json"
+    cmd = [FFMPEG_BIN, "-hide_banner", "-nostats", "-i", str(path), "-vn", "-sn", "-dn", "-af", af, "-f", "null", "-"]
+    res = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, errors='replace')
+    err = res.stderr
+    start, end = err.rfind('{'), err.rfind('}')
+    if res.returncode != 0 or start < 0 or end < start:
+        return None
+    data = json.loads(err[start:end + 1])
+    return {k: float(data[k]) for k in ('input_i', 'input_tp', 'input_lra', 'input_thresh', 'target_offset')}
+
+
+def _load(key, size, mtime):
+    with _lock:
+        hit = _memo.get(key)
+        if hit and hit[0] == size and hit[1] == mtime:
+            return hit[2]
+    try:
+        con = _connect()
+        try:
+            row = con.execute("SELECT size, mtime, data FROM probe WHERE path = ?", (key,)).fetchone()
+            if row and row[0] == size and row[1] == mtime:
+                con.execute("UPDATE probe SET used = ? WHERE path = ?", (time.time(), key))
+                con.commit()
+                info = json.loads(row[2])
+                with _lock:
+                    _memo[key] = (size, mtime, info)
+                return info
+        finally:
+            con.close()
+    except sqlite3.Error:
+        pass
+    return None
+
+
+def _store(key, size, mtime, info):
+    with _lock:
+        _memo[key] = (size, mtime, info)
+    try:
+        con = _connect()
+        try:
+            con.execute("INSERT OR REPLACE INTO probe (path, size, mtime, data, used) VALUES (?, ?, ?, ?, ?)",
+                        (key, size, mtime, json.dumps(info), time.time()))
+            # LRU eviction
+            con.execute("DELETE FROM probe WHERE path IN (SELECT path FROM probe ORDER BY used DESC LIMIT -1 OFFSET ?)", (MAX_ENTRIES,))
+            con.commit()
+        finally:
+            con.close()
+    except sqlite3.Error:
+        pass
+
+
+def probe_media(path, keyframes=False):
+    try:
+        key, size, mtime = file_identity(path)
+    except OSError:
+        return None
+    info = _load(key, size, mtime)
+    dirty = False
+    if info is None:
+        try:
+            info = _run_ffprobe(path)
+        except Exception:
+            return None
+        dirty = True
+    if keyframes and info.get('keyframes') is None:
+        try:
+            info['keyframes'] = _run_keyframes(path)
+        except Exception:
+            info['keyframes'] = []
+        dirty = True
+    if dirty:
+        _store(key, size, mtime, info)
+    return info
+
+
+def measure_loudness(path, target=LOUDNORM_TARGET):
+    # one decode per source and target; later exports with other settings reuse it
+    try:
+        key, size, mtime = file_identity(path)
+    except OSError:
+        return None
+    info = probe_media(path)
+    if info is None:
+        return None
+    target_key = f"{target['I']}/{target['TP']}/{target['LRA']}"
+    measured = (info.get('loudness') or {}).get(target_key)
+    if measured is not None:
+        return measured
+    try:
+        measured = _run_loudness(path, target)
+    except (OSError, ValueError, KeyError):
+        measured = None
+    if measured is None:
+        return None
+    info.setdefault('loudness', {})[target_key] = measured
+    _store(key, size, mtime, info)
+    return measured
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    keyframes = '--keyframes' in argv
+    paths = [a for a in argv if a != '--keyframes']
+    for p in paths:
+        print(json.dumps({'path': p, 'probe': probe_media(p, keyframes=keyframes)}, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import json
+import time
+import hashlib
+import inspect
+import sqlite3
+from pathlib import Path
+
+from workers import CACHE_DIR, FFMPEG_BIN, SAVES_DIR, noop_log
+
+# content-addressed job results: key = input fingerprint + job type + normalized
+# parameters (which fully determine the ffmpeg argument lists the job builds).
+# A hit returns the output already sitting in saves/ instead of encoding again.
+
+RESULTS_DB = CACHE_DIR / "results.sqlite"
+MAX_CACHE_BYTES = 20 * 1024 ** 3
+CHUNK = 1024 * 1024
+SKIP_PARAMS = {'write_log', 'on_progress'}
+
+
+def _connect():
+    CACHE_DIR.mkdir(exist_ok=True)
+    con = sqlite3.connect(str(RESULTS_DB), timeout=30)
+    con.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, output TEXT, bytes INTEGER, used REAL)")
+    return con
+
+
+def input_fingerprint(path):
+    # size + mtime + hash of the first, middle and last MiB: cheap even on huge files
+    p = Path(path)
+    st = p.stat()
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{st.st_size}:{st.st_mtime_ns}".encode())
+    with open(p, 'rb') as fh:
+        for offset in (0, max(st.st_size // 2 - CHUNK // 2, 0), max(st.st_size - CHUNK, 0)):
+            fh.seek(offset)
+            h.update(fh.read(CHUNK))
+    return h.hexdigest()
+
+
+def job_key(kind, func, input_path, args, kwargs):
+    sig = inspect.signature(func)
+    bound = sig.bind(input_path, *args, **kwargs)
+    bound.apply_defaults()
+    input_name = next(iter(sig.parameters))
+    params = {k: v for k, v in bound.arguments.items() if k not in SKIP_PARAMS and k != input_name}
+    if isinstance(params.get('ext'), str):
+        params['ext'] = params['ext'].strip().lstrip('.').lower()
+    payload = json.dumps([kind, FFMPEG_BIN, input_fingerprint(input_path), params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _outputs(stored):
+    out = json.loads(stored)
+    return [Path(p) for p in out] if isinstance(out, list) else Path(out)
+
+
+def lookup(key):
+    con = _connect()
+    try:
+        row = con.execute("SELECT output, bytes FROM results WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        out = _outputs(row[0])
+        paths = out if isinstance(out, list) else [out]
+        if all(p.exists() for p in paths) and sum(p.stat().st_size for p in paths) == row[1]:
+            con.execute("UPDATE results SET used = ? WHERE key = ?", (time.time(), key))
+            con.commit()
+            return out
+        con.execute("DELETE FROM results WHERE key = ?", (key,))
+        con.commit()
+        return None
+    finally:
+        con.close()
+
+
+def store(key, out):
+    paths = out if isinstance(out, list) else [out]
+    stored = json.dumps([str(p) for p in out] if isinstance(out, list) else str(out))
+    con = _connect()
+    try:
+        con.execute("INSERT OR REPLACE INTO results (key, output, bytes, used) VALUES (?, ?, ?, ?)",
+                    (key, stored, sum(p.stat().st_size for p in paths), time.time()))
+        con.commit()
+        evict(con)
+    finally:
+        con.close()
+
+
+def evict(con, max_bytes=MAX_CACHE_BYTES):
+    # drop least recently used cached outputs from saves/ until the total fits
+    total = con.execute("SELECT COALESCE(SUM(bytes), 0) FROM results").fetchone()[0]
+    if total <= max_bytes:
+        return
+    for key, stored, size in con.execute("SELECT key, output, bytes FROM results ORDER BY used").fetchall():
+        out = _outputs(stored)
+        for p in out if isinstance(out, list) else [out]:
+            try:
+                if p.resolve().parent == SAVES_DIR.resolve():
+                    p.unlink()
+            except OSError:
+                pass
+        con.execute("DELETE FROM results WHERE key = ?", (key,))
+        total -= size
+        if total <= max_bytes:
+            break
+    con.commit()
+
+
+def run_cached(kind, func, input_path, args, kwargs):
+    write_log = kwargs.get('write_log') or noop_log
+    try:
+        key = job_key(kind, func, input_path, args, kwargs)
+    except (OSError, TypeError):
+        return func(input_path, *args, **kwargs)
+    try:
+        hit = lookup(key)
+    except sqlite3.Error:
+        hit = None
+    if hit is not None:
+        write_log(f"Такой результат уже есть (кэш): {hit}")
+        return (0, hit)
+
+    rc, out = func(input_path, *args, **kwargs)
+    if rc == 0 and out:
+        try:
+            store(key, out)
+        except (OSError, sqlite3.Error):
+            pass
+    return (rc, out)
@@ -0,0 +1,190 @@
+import os
+import signal
+import itertools
+import threading
+from concurrent.futures import Future
+
+from workers import JobLimits, use_limits
+
+# core-aware job scheduler: every job gets a thread budget by type and its own
+# set of cores (CPU affinity + -threads), jobs are packed until the cores run
+# out instead of N jobs x all-cores threads fighting each other.
+# Short interactive jobs (sound, convert) may pause long background encodes
+# (SIGSTOP), take their cores and let them continue (SIGCONT) when done.
+
+LIGHT = 'light'
+MEDIUM = 'medium'
+HEAVY = 'heavy'
+
+JOB_COST = {
+    'sound': LIGHT,
+    'convert': MEDIUM,
+    'trim': MEDIUM,
+    'compress_fast': HEAVY,
+    'compress_precise': HEAVY,
+    'compress_crf': HEAVY,
+    'fanout': HEAVY,
+}
+
+# lower = more urgent; jobs at BACKGROUND and below may be paused
+JOB_PRIORITY = {'sound': 0, 'convert': 1, 'trim': 1}
+BACKGROUND = 2
+BACKGROUND_NICE = 10
+# libx264 stops scaling well somewhere past this, two encodes beat one wider one
+MAX_ENCODER_THREADS = 16
+
+
+def thread_budget(kind, cores):
+    cost = JOB_COST.get(kind, HEAVY)
+    if cost == LIGHT:
+        return 1
+    if cost == MEDIUM:
+        return max(1, cores // 4)
+    return max(1, min(cores, max(2, cores // 2), MAX_ENCODER_THREADS))
+
+
+def job_priority(kind):
+    return JOB_PRIORITY.get(kind, BACKGROUND)
+
+
+def available_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class _Entry:
+    def __init__(self, seq, fn, args, kwargs, kind, priority, budget):
+        self.seq = seq
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.kind = kind
+        self.priority = priority
+        self.budget = budget
+        self.future = Future()
+        self.cpus = []
+        self.limits = None
+
+    def order(self):
+        return (self.priority, self.seq)
+
+
+class Scheduler:
+    def __init__(self, cores=None, preempt=True):
+        cpus = available_cpus()
+        if cores:
+            cpus = cpus[:cores]
+        self.cpus = cpus
+        self.free = list(cpus)
+        self.preempt = preempt and hasattr(signal, 'SIGSTOP')
+        self.pending = []
+        self.running = []
+        self.suspended = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def submit(self, fn, *args, kind=None, priority=None, **kwargs):
+        priority = job_priority(kind) if priority is None else priority
+        budget = min(thread_budget(kind, len(self.cpus)), len(self.cpus))
+        entry = _Entry(next(self._seq), fn, args, kwargs, kind, priority, budget)
+        with self._lock:
+            self.pending.append(entry)
+            self._dispatch()
+        return entry.future
+
+    def has_room(self):
+        # nothing is waiting for cores: a new job would start (or preempt) right away
+        with self._lock:
+            return not self.pending
+
+    def stats(self):
+        with self._lock:
+            return {'cores': len(self.cpus), 'free': len(self.free), 'running': len(self.running),
+                    'suspended': len(self.suspended), 'pending': len(self.pending)}
+
+    def _dispatch(self):
+        while True:
+            self.pending.sort(key=_Entry.order)
+            nxt = self.pending[0] if self.pending else None
+            # a paused job goes back before new work that is less urgent than it
+            back = min((s for s in self.suspended if nxt is None or s.order() < nxt.order()),
+                       key=_Entry.order, default=None)
+            if back is not None:
+                if len(self.free) < len(back.cpus):
+                    return
+                self._resume(back)
+                continue
+            if nxt is None:
+                return
+            if len(self.free) < nxt.budget and self.preempt and nxt.priority < BACKGROUND:
+                self._preempt_for(nxt)
+            if len(self.free) < nxt.budget:
+                return
+            self.pending.pop(0)
+            self._start(nxt)
+
+    def _preempt_for(self, entry):
+        victims = sorted((r for r in self.running if r.priority >= BACKGROUND and r.priority > entry.priority),
+                         key=lambda r: (-r.priority, -len(r.cpus)))
+        if len(self.free) + sum(len(v.cpus) for v in victims) < entry.budget:
+            return
+        for v in victims:
+            if len(self.free) >= entry.budget:
+                break
+            v.limits.suspend()
+            self.running.remove(v)
+            self.suspended.append(v)
+            self.free.extend(v.cpus)
+
+    def _resume(self, entry):
+        cpus = self.free[:len(entry.cpus)]
+        del self.free[:len(entry.cpus)]
+        entry.cpus = cpus
+        self.suspended.remove(entry)
+        self.running.append(entry)
+        entry.limits.resume(cpus)
+
+    def _start(self, entry):
+        entry.cpus = self.free[:entry.budget]
+        del self.free[:entry.budget]
+        nice = BACKGROUND_NICE if entry.priority >= BACKGROUND else 0
+        entry.limits = JobLimits(cpus=entry.cpus, threads=len(entry.cpus), nice=nice)
+        self.running.append(entry)
+        threading.Thread(target=self._run, args=(entry,), daemon=True).start()
+
+    def _run(self, entry):
+        try:
+            if entry.future.set_running_or_notify_cancel():
+                try:
+                    with use_limits(entry.limits):
+                        result = entry.fn(*entry.args, **entry.kwargs)
+                except BaseException as e:
+                    entry.future.set_exception(e)
+                else:
+                    entry.future.set_result(result)
+        finally:
+            with self._lock:
+                if entry in self.running:
+                    self.running.remove(entry)
+                    self.free.extend(entry.cpus)
+                elif entry in self.suspended:
+                    # finished right as it was paused; its cores are already lent out
+                    self.suspended.remove(entry)
+                self._dispatch()
+                self._idle.notify_all()
+
+    def shutdown(self, wait=True):
+        if not wait:
+            return
+        with self._lock:
+            while self.pending or self.running or self.suspended:
+                self._idle.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown(wait=True)
+        return False
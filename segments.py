@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from workers import FFMPEG_BIN, run_subprocess, current_limits, use_limits, current_metrics, use_metrics
+from probe import probe_media
+
+# chunked mode: split the video stream on keyframes (stream copy), encode the
+# chunks concurrently, encode audio once, then join everything with the concat demuxer
+
+MIN_SEGMENT_SEC = 10.0
+
+
+def keyframe_times(path):
+    info = probe_media(path, keyframes=True)
+    if not info:
+        return []
+    return info.get('keyframes') or []
+
+
+def plan_cuts(keyframes, duration, workers):
+    # aim for ~4 chunks per worker so a slow chunk doesn't leave cores idle at the end
+    target = max(duration / (workers * 4), MIN_SEGMENT_SEC)
+    cuts = []
+    last = 0.0
+    for t in keyframes:
+        if t - last >= target and duration - t >= MIN_SEGMENT_SEC / 2:
+            cuts.append(t)
+            last = t
+    return cuts
+
+
+def _encode_segment(seg, enc_path, video_args, retries, write_log, limits=None, metrics=None, threads=None):
+    cmd = [FFMPEG_BIN, '-y', '-i', str(seg), '-an'] + video_args + [str(enc_path)]
+    with use_limits(limits), use_metrics(metrics):
+        for attempt in range(retries + 1):
+            rc = run_subprocess(cmd, threads=threads)
+            if rc == 0 and enc_path.exists():
+                return 0
+            write_log(f"Сегмент {seg.name}: ошибка (код {rc}), попытка {attempt + 1}/{retries + 1}")
+    return rc or 1
+
+
+def encode_segmented(inp, out_path, duration, video_args, audio_args, write_log, workers=None, retries=2):
+    inp = Path(inp)
+    # a scheduled job only gets its own cores; segment workers stay inside them
+    limits = current_limits()
+    if not workers and limits and limits.cpus:
+        workers = len(limits.cpus)
+    workers = workers or os.cpu_count() or 1
+    # chunk encoders split the cores instead of each starting a full set of x264 threads
+    cores = len(limits.cpus) if limits and limits.cpus else (limits and limits.threads) or os.cpu_count() or 1
+    threads = max(1, cores // workers)
+    keyframes = keyframe_times(inp)
+    cuts = plan_cuts(keyframes, duration, workers)
+    if not cuts:
+        write_log("Не найдено подходящих ключевых кадров — кодируем одним процессом")
+        cmd = [FFMPEG_BIN, '-y', '-i', str(inp)] + video_args + audio_args + [str(out_path)]
+        return run_subprocess(cmd, write_log=write_log)
+
+    tmp = Path(tempfile.mkdtemp(prefix='.seg_', dir=out_path.parent))
+    try:
+        split_cmd = [FFMPEG_BIN, '-y', '-i', str(inp), '-map', '0:v:0', '-c', 'copy', '-f', 'segment',
+                     '-segment_times', ','.join(f"{t:.6f}" for t in cuts), '-reset_timestamps', '1',
+                     '-segment_format', 'matroska', str(tmp / 'src_%05d.mkv')]
+        write_log(f"Разбиение на {len(cuts) + 1} сегментов по ключевым кадрам")
+        rc = run_subprocess(split_cmd, write_log=write_log)
+        segs = sorted(tmp.glob('src_*.mkv'))
+        if rc != 0 or not segs:
+            write_log("Не удалось разбить файл на сегменты")
+            return rc or 1
+
+        encoded = [tmp / seg.name.replace('src_', 'enc_') for seg in segs]
+        write_log(f"Кодирование {len(segs)} сегментов, параллельно: {workers}, потоков на сегмент: {threads}")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_encode_segment, seg, enc, video_args, retries, write_log, limits, current_metrics(),
+                                   threads) for seg, enc in zip(segs, encoded)]
+            audio_path = tmp / 'audio.mka'
+            audio_rc = run_subprocess([FFMPEG_BIN, '-y', '-i', str(inp), '-vn', '-map', '0:a:0?'] + audio_args + [str(audio_path)])
+            codes = [f.result() for f in futures]
+        failed = [seg.name for seg, c in zip(segs, codes) if c != 0]
+        if failed:
+            write_log(f"Сегменты не закодированы: {', '.join(failed)}")
+            return 1
+
+        list_path = tmp / 'list.txt'
+        with open(list_path, 'w', encoding='utf-8') as fh:
+            for enc in encoded:
+                fh.write(f"file '{enc.as_posix()}'\n")
+        concat_cmd = [FFMPEG_BIN, '-y', '-f', 'concat', '-safe', '0', '-i', str(list_path)]
+        if audio_rc == 0 and audio_path.exists() and audio_path.stat().st_size > 0:
+            concat_cmd += ['-i', str(audio_path), '-map', '0:v', '-map', '1:a']
+        concat_cmd += ['-c', 'copy', str(out_path)]
+        write_log(f"Склейка: {' '.join(concat_cmd)}")
+        return run_subprocess(concat_cmd, write_log=write_log)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
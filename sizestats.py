@@ -0,0 +1,73 @@
+import time
+import sqlite3
+import contextlib
+
+from workers import CACHE_DIR
+
+# target vs actual output size of finished compressions, per method + container
+# + codec. Mux overhead and rate-control drift show up as actual/target > 1;
+# the median of the recent ratios divides the next target.
+
+SIZES_DB = CACHE_DIR / "sizes.sqlite"
+WINDOW = 20
+MIN_SAMPLES = 3
+MIN_FACTOR = 0.8
+MAX_FACTOR = 1.3
+# off: nothing recorded, correction() is 1.0 (benchmarks must neither feed nor read it)
+ENABLED = True
+
+
+def _connect():
+    CACHE_DIR.mkdir(exist_ok=True)
+    con = sqlite3.connect(str(SIZES_DB), timeout=30)
+    con.execute("CREATE TABLE IF NOT EXISTS sizes (method TEXT, container TEXT, codec TEXT, "
+                "target INTEGER, actual INTEGER, ts REAL)")
+    con.execute("CREATE INDEX IF NOT EXISTS sizes_key ON sizes (method, container, codec, ts)")
+    return con
+
+
+@contextlib.contextmanager
+def learning_disabled():
+    global ENABLED
+    prev = ENABLED
+    ENABLED = False
+    try:
+        yield
+    finally:
+        ENABLED = prev
+
+
+def record(method, container, codec, target_bytes, actual_bytes):
+    if not ENABLED:
+        return
+    try:
+        con = _connect()
+        try:
+            con.execute("INSERT INTO sizes (method, container, codec, target, actual, ts) VALUES (?, ?, ?, ?, ?, ?)",
+                        (method, container.lower().lstrip('.'), codec, int(target_bytes), int(actual_bytes), time.time()))
+            con.commit()
+        finally:
+            con.close()
+    except sqlite3.Error:
+        pass
+
+
+def correction(method, container, codec):
+    # 1.0 until there are enough samples to trust
+    if not ENABLED:
+        return 1.0
+    try:
+        con = _connect()
+        try:
+            rows = con.execute("SELECT target, actual FROM sizes WHERE method = ? AND container = ? AND codec = ? "
+                               "ORDER BY ts DESC LIMIT ?",
+                               (method, container.lower().lstrip('.'), codec, WINDOW)).fetchall()
+        finally:
+            con.close()
+    except sqlite3.Error:
+        return 1.0
+    ratios = sorted(actual / target for target, actual in rows if target > 0)
+    if len(ratios) < MIN_SAMPLES:
+        return 1.0
+    median = ratios[len(ratios) // 2] if len(ratios) % 2 else (ratios[len(ratios) // 2 - 1] + ratios[len(ratios) // 2]) / 2
+    return min(max(median, MIN_FACTOR), MAX_FACTOR)
@@ -0,0 +1,195 @@
+import sys
+import argparse
+from pathlib import Path
+
+from workers import FFMPEG_BIN, LOUDNORM_TARGET, run_subprocess, sound_filters, video_bitrate_for_size, noop_log
+from compat import encoder_args
+
+# pipe-to-pipe mode: the source comes from stdin or a FIFO, the result goes to
+# stdout (or a FIFO) in a container that is written strictly front to back, so
+# output starts while the input is still arriving and nothing touches the disk.
+# There is no probing and no second pass: everything has to be decided from the
+# command line before the first byte is read.
+
+STREAM_MUXERS = {
+    # fragmented MP4: empty moov up front, then one moof+mdat per keyframe
+    'mp4': ['-f', 'mp4', '-movflags', 'frag_keyframe+empty_moov+default_base_moof'],
+    'mkv': ['-f', 'matroska', '-live', '1'],
+    'webm': ['-f', 'webm', '-live', '1'],
+    'ts': ['-f', 'mpegts'],
+    'mp3': ['-f', 'mp3'],
+    'aac': ['-f', 'adts'],
+    'flac': ['-f', 'flac'],
+    'ogg': ['-f', 'ogg'],
+    'opus': ['-f', 'opus'],
+    'wav': ['-f', 'wav'],
+    # raw PCM, no header: the reader has to know the format below
+    'pcm': ['-f', 's16le'],
+}
+AUDIO_ONLY = {'mp3', 'aac', 'flac', 'ogg', 'opus', 'wav', 'pcm'}
+LOSSLESS = {'wav', 'flac'}
+# single-pass encoders for a bitrate target; the compat table has quality-based ones
+ABR_VIDEO_ENCODERS = {
+    'webm': ['-c:v', 'libvpx-vp9', '-deadline', 'realtime', '-cpu-used', '8', '-row-mt', '1'],
+}
+DEFAULT_ABR_VIDEO_ENCODER = ['-c:v', 'libx264', '-preset', 'fast']
+PCM_RATE = 48000
+PCM_CHANNELS = 2
+# a keyframe (= a new fragment/cluster) this often, so the reader gets data without waiting out a long GOP
+KEYFRAME_SEC = 2
+
+
+def _input_args(source):
+    if source in (None, '-'):
+        return ['-i', 'pipe:0']
+    # a FIFO path: ffmpeg must not read our stdin for key commands
+    return ['-nostdin', '-i', str(source)]
+
+
+def _audio_codec(fmt, kbit=None):
+    if fmt == 'pcm':
+        return ['-c:a', 'pcm_s16le', '-ar', str(PCM_RATE), '-ac', str(PCM_CHANNELS)]
+    if kbit is None or fmt in LOSSLESS:
+        return encoder_args('audio', fmt)
+    return encoder_args('audio', fmt)[:2] + ['-b:a', f"{kbit}k"]
+
+
+def _keyframes():
+    return ['-force_key_frames', f"expr:gte(t,n_forced*{KEYFRAME_SEC})"]
+
+
+def _run(source, fmt, args, output, write_log):
+    if source not in (None, '-') and not Path(source).exists():
+        write_log(f"Источник не найден: {source}")
+        return (2, None)
+    if output in (None, '-'):
+        dest, stdout = 'pipe:1', sys.stdout.buffer
+        sys.stdout.flush()
+    else:
+        dest, stdout = str(output), None
+    cmd = [FFMPEG_BIN, '-hide_banner', '-y'] + _input_args(source) + args + STREAM_MUXERS[fmt] + [dest]
+    write_log(f"Команда (поток): {' '.join(cmd)}")
+    rc = run_subprocess(cmd, write_log=write_log, stdout=stdout)
+    if rc != 0:
+        write_log(f"ffmpeg завершился с кодом {rc}")
+    return (rc, None if stdout else Path(output))
+
+
+def _check_format(fmt, write_log):
+    if fmt not in STREAM_MUXERS:
+        write_log(f"Формат не поддерживается в потоковом режиме: {fmt} (есть: {', '.join(STREAM_MUXERS)})")
+        return False
+    return True
+
+
+def stream_convert(source, fmt, copy=False, output=None, write_log=None):
+    write_log = write_log or noop_log
+    fmt = fmt.strip().lstrip('.').lower()
+    if not _check_format(fmt, write_log):
+        return (2, None)
+    # the streams can't be probed ahead: either copy everything or encode for the container
+    if fmt in AUDIO_ONLY:
+        args = ['-map', '0:a:0', '-vn'] + (['-c:a', 'copy'] if copy else _audio_codec(fmt))
+    elif copy:
+        args = ['-map', '0:v:0?', '-map', '0:a:0?', '-c', 'copy']
+    else:
+        args = ['-map', '0:v:0?', '-map', '0:a:0?'] + encoder_args('video', fmt) + _keyframes() + _audio_codec(fmt)
+    return _run(source, fmt, args, output, write_log)
+
+
+def stream_compress(source, fmt, video_kbit=None, audio_kbit=128, size_mb=None, duration=None, output=None,
+                    write_log=None):
+    # single pass ABR with a VBV cap; a size target needs the duration up front
+    write_log = write_log or noop_log
+    fmt = fmt.strip().lstrip('.').lower()
+    if not _check_format(fmt, write_log):
+        return (2, None)
+    if fmt in AUDIO_ONLY:
+        write_log("Для сжатия видео нужен видеоконтейнер (mp4, mkv, webm, ts)")
+        return (2, None)
+    if video_kbit:
+        video_bps = int(video_kbit * 1000)
+    elif size_mb and duration:
+        video_bps = video_bitrate_for_size(size_mb, audio_kbit, duration, write_log)
+    else:
+        write_log("Укажите видеобитрейт или размер вместе с длительностью источника")
+        return (2, None)
+    write_log(f"video_bitrate={video_bps} bps, audio={audio_kbit}k")
+    video = ABR_VIDEO_ENCODERS.get(fmt, DEFAULT_ABR_VIDEO_ENCODER) + [
+        '-b:v', str(video_bps), '-maxrate', str(int(video_bps * 1.5)), '-bufsize', str(video_bps * 2)]
+    args = ['-map', '0:v:0', '-map', '0:a:0?'] + video + _keyframes() + _audio_codec(fmt, audio_kbit)
+    return _run(source, fmt, args, output, write_log)
+
+
+def stream_sound(source, fmt, speed=1.0, bass=0, treble=0, gain=0, bitrate=192, normalize=False, output=None,
+                 write_log=None):
+    write_log = write_log or noop_log
+    fmt = fmt.strip().lstrip('.').lower()
+    if not _check_format(fmt, write_log):
+        return (2, None)
+    af = sound_filters(speed, bass, treble, gain)
+    if normalize:
+        # no stored measurement for a stream: loudnorm's one-pass dynamic mode
+        # works with a few seconds of lookahead instead
+        af = [f"loudnorm=I={LOUDNORM_TARGET['I']}:TP={LOUDNORM_TARGET['TP']}:LRA={LOUDNORM_TARGET['LRA']}",
+              f"aresample={PCM_RATE}"] + af
+    if fmt in AUDIO_ONLY:
+        args = ['-map', '0:a:0', '-vn']
+    else:
+        # video passes through untouched; only the audio chain runs
+        args = ['-map', '0:v:0?', '-map', '0:a:0', '-c:v', 'copy']
+    if af:
+        args += ['-af', ','.join(af)]
+    args += _audio_codec(fmt, bitrate)
+    return _run(source, fmt, args, output, write_log)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Потоковый режим: stdin/FIFO -> stdout/FIFO без временных файлов")
+    sub = parser.add_subparsers(dest='mode', required=True)
+
+    def common(p):
+        p.add_argument('-i', '--input', default='-', help="источник: - (stdin) или путь к FIFO")
+        p.add_argument('-o', '--output', default='-', help="куда писать: - (stdout) или путь к FIFO")
+        p.add_argument('-f', '--format', required=True, choices=sorted(STREAM_MUXERS), help="выходной формат")
+        p.add_argument('-q', '--quiet', action='store_true', help="не печатать лог ffmpeg в stderr")
+
+    p = sub.add_parser('convert', help="конвертация")
+    common(p)
+    p.add_argument('--copy', action='store_true', help="только перепаковать потоки без перекодирования")
+
+    p = sub.add_parser('compress', help="сжатие в один проход")
+    common(p)
+    p.add_argument('--video-kbit', dest='video_kbit', type=float)
+    p.add_argument('--audio-kbit', dest='audio_kbit', type=int, default=128)
+    p.add_argument('--size-mb', dest='size_mb', type=float, help="целевой размер (вместе с --duration)")
+    p.add_argument('--duration', type=float, help="длительность источника в секундах")
+
+    p = sub.add_parser('sound', help="эквалайзер и скорость")
+    common(p)
+    p.add_argument('--speed', type=float, default=1.0)
+    p.add_argument('--bass', type=int, default=0)
+    p.add_argument('--treble', type=int, default=0)
+    p.add_argument('--gain', type=int, default=0)
+    p.add_argument('--bitrate', type=int, default=192)
+    p.add_argument('--normalize', action='store_true', help="выровнять громкость (однопроходный loudnorm)")
+    args = parser.parse_args(argv)
+
+    def log(text):
+        if not args.quiet:
+            sys.stderr.write(text if text.endswith('\n') else text + '\n')
+
+    if args.mode == 'convert':
+        rc, _ = stream_convert(args.input, args.format, copy=args.copy, output=args.output, write_log=log)
+    elif args.mode == 'compress':
+        rc, _ = stream_compress(args.input, args.format, video_kbit=args.video_kbit, audio_kbit=args.audio_kbit,
+                                size_mb=args.size_mb, duration=args.duration, output=args.output, write_log=log)
+    else:
+        rc, _ = stream_sound(args.input, args.format, speed=args.speed, bass=args.bass, treble=args.treble,
+                             gain=args.gain, bitrate=args.bitrate, normalize=args.normalize, output=args.output,
+                             write_log=log)
+    return rc
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import time
+import threading
+
+import pytest
+
+import scheduler
+from workers import current_limits
+
+TIMEOUT = 5
+
+
+class FakeJob:
+    # blocks until released; remembers the limits it ran with
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.limits = None
+
+    def __call__(self):
+        self.limits = current_limits()
+        self.started.set()
+        assert self.release.wait(TIMEOUT)
+        return 'ok'
+
+
+@pytest.fixture
+def make_scheduler(monkeypatch):
+    monkeypatch.setattr(scheduler, 'available_cpus', lambda: list(range(8)))
+    return scheduler.Scheduler
+
+
+def _finish(job, future):
+    job.release.set()
+    assert future.result(TIMEOUT) == 'ok'
+
+
+def _until(cond):
+    # the result is set before the scheduler hands the cores on
+    deadline = time.monotonic() + TIMEOUT
+    while not cond():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_thread_budget():
+    assert scheduler.thread_budget('sound', 8) == 1
+    assert scheduler.thread_budget('convert', 8) == 2
+    assert scheduler.thread_budget('compress_fast', 8) == 4
+    assert scheduler.thread_budget('compress_fast', 64) == scheduler.MAX_ENCODER_THREADS
+    assert scheduler.thread_budget('compress_fast', 1) == 1
+
+
+def test_packs_jobs_on_disjoint_cores(make_scheduler):
+    s = make_scheduler()
+    jobs = [FakeJob() for _ in range(3)]
+    futures = [s.submit(job, kind='compress_fast') for job in jobs]
+    assert jobs[0].started.wait(TIMEOUT) and jobs[1].started.wait(TIMEOUT)
+    a, b = jobs[0].limits, jobs[1].limits
+    assert len(a.cpus) == len(b.cpus) == a.threads == 4
+    assert not set(a.cpus) & set(b.cpus)
+    assert a.nice == scheduler.BACKGROUND_NICE
+    # the third heavy job waits for cores instead of oversubscribing
+    assert not jobs[2].started.is_set()
+    assert s.stats()['pending'] == 1 and not s.has_room()
+
+    _finish(jobs[0], futures[0])
+    assert jobs[2].started.wait(TIMEOUT)
+    assert set(jobs[2].limits.cpus) == set(a.cpus)
+    for job, fut in zip(jobs[1:], futures[1:]):
+        _finish(job, fut)
+    s.shutdown()
+    assert s.stats() == {'cores': 8, 'free': 8, 'running': 0, 'suspended': 0, 'pending': 0}
+
+
+def test_interactive_job_suspends_and_resumes_background(make_scheduler):
+    s = make_scheduler(preempt=True)
+    if not s.preempt:
+        pytest.skip("no SIGSTOP on this platform")
+    heavy = [FakeJob() for _ in range(2)]
+    heavy_futures = [s.submit(job, kind='compress_fast') for job in heavy]
+    assert all(job.started.wait(TIMEOUT) for job in heavy)
+
+    sound = FakeJob()
+    sound_future = s.submit(sound, kind='sound')
+    assert sound.started.wait(TIMEOUT)
+    assert sound.limits.nice == 0 and sound.limits.threads == 1
+    paused = [job for job in heavy if job.limits.suspended]
+    assert len(paused) == 1
+    assert s.stats()['suspended'] == 1
+    victim = paused[0]
+
+    _finish(sound, sound_future)
+    # the paused encode gets cores again, as many as it had
+    _until(lambda: not victim.limits.suspended)
+    assert len(victim.limits.cpus) == 4
+    assert s.stats()['suspended'] == 0
+    for job, fut in zip(heavy, heavy_futures):
+        _finish(job, fut)
+    s.shutdown()
+    assert s.stats()['free'] == 8
+
+
+def test_no_preemption_waits(make_scheduler):
+    s = make_scheduler(preempt=False)
+    heavy = [FakeJob() for _ in range(2)]
+    heavy_futures = [s.submit(job, kind='compress_fast') for job in heavy]
+    assert all(job.started.wait(TIMEOUT) for job in heavy)
+    sound = FakeJob()
+    sound_future = s.submit(sound, kind='sound')
+    assert not sound.started.is_set()
+    assert not any(job.limits.suspended for job in heavy)
+
+    _finish(heavy[0], heavy_futures[0])
+    assert sound.started.wait(TIMEOUT)
+    _finish(sound, sound_future)
+    _finish(heavy[1], heavy_futures[1])
+
+
+def test_background_jobs_are_not_preempted_by_background(make_scheduler):
+    s = make_scheduler()
+    heavy = [FakeJob() for _ in range(2)]
+    heavy_futures = [s.submit(job, kind='compress_fast') for job in heavy]
+    assert all(job.started.wait(TIMEOUT) for job in heavy)
+    third = FakeJob()
+    third_future = s.submit(third, kind='compress_crf')
+    assert not any(job.limits.suspended for job in heavy)
+    assert not third.started.is_set()
+    for job, fut in zip(heavy, heavy_futures):
+        _finish(job, fut)
+    _finish(third, third_future)
+
+
+def test_exception_frees_cores(make_scheduler):
+    s = make_scheduler()
+
+    def boom():
+        raise ValueError('boom')
+    with pytest.raises(ValueError):
+        s.submit(boom, kind='compress_fast').result(TIMEOUT)
+    s.shutdown()
+    assert s.stats()['free'] == 8
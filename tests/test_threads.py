@@ -0,0 +1,85 @@
+from pathlib import Path
+
+import workers
+import fanout
+import segments
+from workers import with_threads, output_positions
+
+
+def _threads_before(cmd, path):
+    i = cmd.index(path)
+    return cmd[i - 2:i]
+
+
+def test_single_output():
+    cmd = with_threads(['ffmpeg', '-y', '-i', 'in.mp4', '-c:v', 'libx264', '-b:v', '1000', 'out.mp4'], 4)
+    assert cmd[:3] == ['ffmpeg', '-filter_threads', '4']
+    assert _threads_before(cmd, 'out.mp4') == ['-threads', '4']
+    # an input option only limits the decoder
+    assert cmd.index('-threads') > cmd.index('-i')
+
+
+def test_flags_and_null_output():
+    cmd = with_threads(['ffmpeg', '-y', '-i', 'in.mp4', '-c:v', 'libx264', '-pass', '1', '-an', '-sn', '-dn',
+                        '-f', 'null', '/dev/null'], 2)
+    assert _threads_before(cmd, '/dev/null') == ['-threads', '2']
+    assert cmd.count('-threads') == 1
+
+
+def test_multi_input_multi_output():
+    cmd = ['ffmpeg', '-y', '-i', 'in.mp4', '-i', 'first.mp4', '-map', '0:v:0', '-map', '1:a?',
+           '-c:v', 'libx264', 'a.mp4', '-map', '0:a:0', '-c:a', 'copy', '-shortest', 'b.mka']
+    assert [cmd[i] for i in output_positions(cmd)] == ['a.mp4', 'b.mka']
+    out = with_threads(cmd, 3)
+    assert _threads_before(out, 'a.mp4') == ['-threads', '3']
+    assert _threads_before(out, 'b.mka') == ['-threads', '3']
+    assert out.count('-threads') == 2
+
+
+def test_no_input():
+    assert output_positions(['ffmpeg', '-version']) == []
+    assert with_threads(['ffmpeg', '-version'], 2) == ['ffmpeg', '-filter_threads', '2', '-version']
+
+
+def test_fanout_outputs(monkeypatch, tmp_path):
+    monkeypatch.setattr(fanout, 'SAVES_DIR', tmp_path)
+    monkeypatch.setattr(fanout, 'size_correction', lambda *a, **k: 1.0)
+    monkeypatch.setattr(fanout, 'fit_video_filters', lambda inp, bps, log=None: ['-vf', 'scale=round(iw*1/2)*2:-2'])
+    monkeypatch.setattr(fanout, 'choose_encoder', lambda codec, log=None: codec)
+    info = {'duration': 10.0, 'video': {'codec': 'h264', 'width': 1280, 'height': 720, 'fps': 25},
+            'audio': {'codec': 'aac', 'sample_rate': 48000}, 'streams': []}
+    outputs = [{'type': 'convert', 'ext': 'mkv'}, {'type': 'compress', 'size_mb': 5},
+               {'type': 'sound', 'ext': 'mp3', 'bass': 4}]
+    cmd, paths, targets = fanout.build_fanout(Path('in.mp4'), info, outputs)
+    assert len(paths) == 3 and list(targets) == [paths[1]]
+    out = with_threads(cmd, 6)
+    for p in paths:
+        assert _threads_before(out, str(workers.partial_path(p))) == ['-threads', '6']
+    assert out.count('-threads') == 3
+    assert out[:3] == ['ffmpeg', '-filter_threads', '6']
+
+
+def test_segments_split_cores(monkeypatch, tmp_path):
+    calls = []
+
+    def fake_run(cmd, write_log=None, threads=None, **kwargs):
+        calls.append((cmd, threads))
+        out = Path(cmd[-1])
+        if '%' in out.name:
+            for i in range(4):
+                (out.parent / (out.name % i)).write_bytes(b'x')
+        else:
+            out.write_bytes(b'x')
+        return 0
+
+    monkeypatch.setattr(segments, 'run_subprocess', fake_run)
+    monkeypatch.setattr(segments, 'keyframe_times', lambda path: [0.0, 10.0, 20.0, 30.0, 40.0, 50.0, 60.0, 70.0])
+    limits = workers.JobLimits(cpus=list(range(8)), threads=8)
+    with workers.use_limits(limits):
+        rc = segments.encode_segmented(tmp_path / 'in.mp4', tmp_path / 'out.mp4', 80.0, ['-c:v', 'libx264'],
+                                       ['-c:a', 'aac'], lambda text: None, workers=4)
+    assert rc == 0
+    chunks = [(cmd, threads) for cmd, threads in calls if '-an' in cmd]
+    assert chunks and all(threads == 2 for _, threads in chunks)
+    cmd, threads = chunks[0]
+    assert _threads_before(with_threads(cmd, threads), cmd[-1]) == ['-threads', '2']
@@ -0,0 +1,147 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from workers import (FFMPEG_BIN, SAVES_DIR, unique_path, partial_path, run_subprocess, finish_job, noop_log,
+                     result_cached)
+from probe import probe_media
+from compat import CONTAINERS, encoder_args
+
+# smart cut: only the partial GOPs at the in and out points are re-encoded,
+# everything between the first and the last keyframe inside the range is
+# stream-copied. Pieces go through MPEG-TS (parameter sets in-band, so a
+# re-encoded head and a copied middle can follow each other) and are joined
+# with the concat demuxer; audio is cut once for the whole range.
+#
+#   [start .. k_in)   re-encode, same codec as the source
+#   [k_in .. k_out)   copy
+#   [k_out .. end)    re-encode
+
+# encoders that produce a stream the copied source GOPs can be concatenated with
+SMART_ENCODERS = {
+    'h264': ['-c:v', 'libx264', '-preset', 'fast', '-crf', '18'],
+    'hevc': ['-c:v', 'libx265', '-preset', 'fast', '-crf', '20'],
+    'mpeg2video': ['-c:v', 'mpeg2video', '-q:v', '2'],
+}
+
+
+def parse_time(value):
+    # "00:12:03", "12:03.5", "723" -> seconds
+    if isinstance(value, (int, float)):
+        return float(value)
+    secs = 0.0
+    for part in str(value).strip().split(':'):
+        secs = secs * 60 + float(part)
+    return secs
+
+
+def _video_piece(inp, start, length, video_args, out):
+    return [FFMPEG_BIN, '-y', '-ss', f"{start:.6f}", '-i', str(inp), '-t', f"{length:.6f}",
+            '-map', '0:v:0', '-an', '-sn'] + video_args + ['-f', 'mpegts', str(out)]
+
+
+def _smart_pieces(inp, info, start, end, tmp):
+    # -> list of ffmpeg commands (output path last) or None when a smart cut isn't possible
+    video = info.get('video')
+    if not video or video['codec'] not in SMART_ENCODERS:
+        return None
+    keyframes = [t for t in info.get('keyframes') or [] if start <= t <= end]
+    if len(keyframes) < 2:
+        return None
+    k_in, k_out = keyframes[0], keyframes[-1]
+    frame = 1.0 / (video.get('fps') or 25.0)
+    encode = list(SMART_ENCODERS[video['codec']])
+    if video.get('pix_fmt'):
+        encode += ['-pix_fmt', video['pix_fmt']]
+
+    pieces = []
+    if k_in - start >= frame / 2:
+        pieces.append(_video_piece(inp, start, k_in - start, encode, tmp / 'head.ts'))
+    pieces.append(_video_piece(inp, k_in, k_out - k_in, ['-c:v', 'copy'], tmp / 'middle.ts'))
+    if end - k_out >= frame / 2:
+        pieces.append(_video_piece(inp, k_out, end - k_out, encode, tmp / 'tail.ts'))
+    return pieces
+
+
+@result_cached('trim')
+def trim(input_path, start, end, ext=None, write_log=None, on_progress=None):
+    write_log = write_log or noop_log
+    inp = Path(input_path)
+    if not inp.exists():
+        write_log(f"Файл не найден: {input_path}")
+        return (2, None)
+    start, end = parse_time(start), parse_time(end)
+    info = probe_media(inp, keyframes=True)
+    if not info or not info.get('duration'):
+        write_log("Не удалось прочитать параметры файла (ffprobe)")
+        return (1, None)
+    end = min(end, info['duration'])
+    if start < 0 or end <= start:
+        write_log(f"Неверный интервал: {start:.3f}–{end:.3f}")
+        return (2, None)
+
+    ext = (ext or inp.suffix).strip().lstrip('.').lower()
+    out_path = unique_path(SAVES_DIR / f"{inp.stem}_cut_{int(start)}-{int(end)}.{ext}")
+    part = partial_path(out_path)
+    table = CONTAINERS.get(ext, CONTAINERS['mkv'])
+    video = info.get('video')
+    length = end - start
+
+    tmp = Path(tempfile.mkdtemp(prefix='.cut_', dir=SAVES_DIR))
+    try:
+        pieces = None
+        if video and (table['video'] is None or video['codec'] in table['video']):
+            pieces = _smart_pieces(inp, info, start, end, tmp)
+        if pieces is None:
+            # nothing to copy (no keyframe inside, codec we can't match, container
+            # doesn't take it): the range is short or has to be re-encoded anyway
+            write_log("Умная обрезка невозможна — перекодируем только выбранный интервал")
+            cmd = [FFMPEG_BIN, '-y', '-ss', f"{start:.6f}", '-i', str(inp), '-t', f"{length:.6f}"]
+            if video and table['video'] != set():
+                cmd += encoder_args('video', ext)
+            else:
+                cmd += ['-vn']
+            audio = info.get('audio')
+            if not audio or table['audio'] == set():
+                cmd += ['-an']
+            elif table['audio'] is None or audio['codec'] in table['audio']:
+                cmd += ['-c:a', 'copy']
+            else:
+                cmd += encoder_args('audio', ext)
+            cmd.append(str(part))
+            write_log(f"Команда: {' '.join(cmd)}")
+            rc = run_subprocess(cmd, write_log=write_log, on_progress=on_progress, duration=length)
+            return finish_job(rc, out_path, write_log, "Не удалось вырезать фрагмент")
+
+        write_log(f"Умная обрезка: частей — {len(pieces)}, перекодируются только края интервала")
+        for cmd in pieces:
+            write_log(f"Команда: {' '.join(cmd)}")
+            rc = run_subprocess(cmd, write_log=write_log)
+            if rc != 0:
+                return finish_job(rc, out_path, write_log, "Не удалось подготовить части фрагмента")
+
+        audio_path = None
+        if info.get('audio') and table['audio'] != set():
+            audio_path = tmp / 'audio.mka'
+            if table['audio'] is None or info['audio']['codec'] in table['audio']:
+                audio_args = ['-c:a', 'copy']
+            else:
+                audio_args = encoder_args('audio', ext)
+            rc = run_subprocess([FFMPEG_BIN, '-y', '-ss', f"{start:.6f}", '-i', str(inp), '-t', f"{length:.6f}",
+                                 '-vn', '-map', '0:a:0'] + audio_args + [str(audio_path)], write_log=write_log)
+            if rc != 0 or not audio_path.exists():
+                return finish_job(rc or 1, out_path, write_log, "Не удалось вырезать звук")
+
+        list_path = tmp / 'list.txt'
+        with open(list_path, 'w', encoding='utf-8') as fh:
+            for cmd in pieces:
+                fh.write(f"file '{Path(cmd[-1]).as_posix()}'\n")
+        cmd = [FFMPEG_BIN, '-y', '-f', 'concat', '-safe', '0', '-i', str(list_path)]
+        if audio_path:
+            cmd += ['-i', str(audio_path), '-map', '0:v', '-map', '1:a']
+        cmd += ['-c', 'copy', str(part)]
+        write_log(f"Склейка: {' '.join(cmd)}")
+        rc = run_subprocess(cmd, write_log=write_log, on_progress=on_progress, duration=length)
+        return finish_job(rc, out_path, write_log, "Не удалось склеить фрагмент")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
@@ -0,0 +1,214 @@
+import os
+import sys
+import json
+import time
+import fnmatch
+import argparse
+from pathlib import Path
+from concurrent.futures import wait, FIRST_COMPLETED
+
+from workers import EQ_PRESETS
+from batch import JOB_TYPES, make_pool, submit_job, failed_result
+from jobqueue import JobQueue
+from metrics import METRICS_LOG
+
+# watch-folder mode: poll the configured input directories, wait until a file
+# stops growing (same size and mtime over several polls), then put a job for it
+# into the persistent queue according to the directory's rule.
+#
+# config:
+# {"poll_sec": 2, "stable_polls": 3,
+#  "dirs": [{"path": "in/mp4", "rule": {"type": "convert", "ext": "mp4"}},
+#           {"path": "in/25mb", "pattern": "*.mkv", "rule": {"type": "compress_fast", "size_mb": 25}},
+#           {"path": "in/voice", "rule": {"type": "sound", "ext": "mp3", "preset": "voice"}}]}
+
+POLL_SEC = 2.0
+STABLE_POLLS = 3
+REPORT_SEC = 30.0
+JOB_OWNER = 'watch'
+
+
+def load_config(path):
+    with open(path, encoding='utf-8') as fh:
+        cfg = json.load(fh)
+    dirs = cfg.get('dirs') or []
+    if not dirs:
+        raise ValueError("в конфиге нет каталогов (dirs)")
+    for d in dirs:
+        rule = d.get('rule') or {}
+        if rule.get('type') not in JOB_TYPES:
+            raise ValueError(f"{d.get('path')}: неизвестный тип задания {rule.get('type')}")
+        if rule.get('preset') and rule['preset'] not in EQ_PRESETS:
+            raise ValueError(f"{d.get('path')}: неизвестный пресет {rule['preset']}")
+        Path(d['path']).mkdir(parents=True, exist_ok=True)
+    return cfg
+
+
+def rule_job(rule, path, st):
+    job = dict(rule)
+    preset = job.pop('preset', None)
+    if preset:
+        # explicit values in the rule win over the preset
+        job = dict(EQ_PRESETS[preset], **job)
+    job['input'] = str(path)
+    # part of the queue signature only: a file replaced under the same name is a new job
+    job['source_stamp'] = f"{st.st_size}:{st.st_mtime_ns}"
+    return job
+
+
+def scan(d):
+    root = Path(d['path'])
+    pattern = d.get('pattern', '*')
+    files = root.rglob('*') if d.get('recursive') else root.iterdir()
+    for p in files:
+        if p.name.startswith('.') or not fnmatch.fnmatch(p.name, pattern):
+            continue
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        if p.is_file():
+            yield p, st
+
+
+class StabilityTracker:
+    # a file is ready once size and mtime haven't changed for `polls` scans in a row
+    def __init__(self, polls=STABLE_POLLS):
+        self.polls = polls
+        self.seen = {}
+        # path -> state it was queued in; a file rewritten in place comes back with a new one
+        self.done = {}
+
+    def ready(self, path, st):
+        state = (st.st_size, st.st_mtime_ns)
+        if self.done.get(path) == state:
+            return False
+        prev, count = self.seen.get(path, (None, 0))
+        count = count + 1 if prev == state else 1
+        self.seen[path] = (state, count)
+        if count >= self.polls and st.st_size > 0:
+            self.done[path] = state
+            del self.seen[path]
+            return True
+        return False
+
+    def forget_missing(self, present):
+        # a long-running daemon sees many files come and go: keep only those still there
+        for table in (self.seen, self.done):
+            for path in list(table):
+                if path not in present:
+                    del table[path]
+
+
+class Throughput:
+    def __init__(self):
+        self.started = time.time()
+        self.done = 0
+        self.failed = 0
+        self.bytes_in = 0
+
+    def add(self, res, size):
+        if res['rc'] == 0:
+            self.done += 1
+            self.bytes_in += size
+        else:
+            self.failed += 1
+
+    def line(self, counts, running):
+        mins = max(time.time() - self.started, 1e-6) / 60
+        return (f"Обработано: {self.done} ({self.done / mins:.2f} файлов/мин, "
+                f"{self.bytes_in / 1024 ** 2 / (mins * 60):.2f} МБ/с на входе), ошибок: {self.failed}, "
+                f"в очереди: {counts.get('queued', 0)}, выполняется: {running}")
+
+
+def watch(cfg, max_workers=None, log_dir=None, schedule=False, on_result=None, on_report=None, stop=None, queue=None,
+          metrics_path=None):
+    max_workers = max_workers or cfg.get('jobs') or os.cpu_count() or 1
+    poll = float(cfg.get('poll_sec', POLL_SEC))
+    report_every = float(cfg.get('report_sec', REPORT_SEC))
+    queue = queue or JobQueue()
+    queue.recover(owner=JOB_OWNER)
+    tracker = StabilityTracker(int(cfg.get('stable_polls', STABLE_POLLS)))
+    stats = Throughput()
+    last_report = time.time()
+
+    with make_pool(max_workers, schedule) as pool:
+        running = {}
+        while not (stop and stop.is_set()):
+            # one set over all dirs: pruning per dir would drop the other dirs' files
+            present = set()
+            for d in cfg['dirs']:
+                for path, st in scan(d):
+                    present.add(path)
+                    if tracker.ready(path, st):
+                        queue.add(rule_job(d['rule'], path, st), owner=JOB_OWNER)
+            tracker.forget_missing(present)
+
+            while pool.has_room() if schedule else len(running) < max_workers:
+                item = queue.claim(owner=JOB_OWNER)
+                if item is None:
+                    break
+                job_id, job = item
+                running[submit_job(pool, job, log_dir, None, job_id, metrics_path)] = (job_id, job)
+
+            if running:
+                done, _ = wait(running, timeout=poll, return_when=FIRST_COMPLETED)
+            else:
+                done = ()
+                time.sleep(poll)
+            for fut in done:
+                job_id, job = running.pop(fut)
+                try:
+                    res = fut.result()
+                except Exception as e:
+                    res = failed_result(job, str(e))
+                queue.finish(job_id, res['rc'], res['output'], res.get('error'))
+                stats.add(res, int(job.get('source_stamp', '0:').split(':')[0] or 0))
+                if on_result:
+                    on_result(res)
+
+            if on_report and time.time() - last_report >= report_every:
+                on_report(stats.line(queue.counts(owner=JOB_OWNER), len(running)))
+                last_report = time.time()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="VideoCodexConvertor: обработка файлов из отслеживаемых папок")
+    parser.add_argument('config', help="JSON с каталогами и правилами")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="число параллельных заданий")
+    parser.add_argument('--schedule', action='store_true', help="делить ядра между заданиями по их типу")
+    parser.add_argument('--log-dir', help="каталог для логов ffmpeg по каждому заданию")
+    parser.add_argument('--no-metrics', dest='no_metrics', action='store_true', help="не записывать метрики заданий")
+    args = parser.parse_args(argv)
+
+    try:
+        cfg = load_config(args.config)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка конфига: {e}", file=sys.stderr)
+        return 2
+    if args.log_dir:
+        Path(args.log_dir).mkdir(parents=True, exist_ok=True)
+
+    def report(res):
+        output = res['output']
+        if isinstance(output, list):
+            output = ', '.join(output)
+        print(f"{res['rc']}\t{res['input']}\t{output or '-'}", flush=True)
+
+    def show_stats(line):
+        print(line, file=sys.stderr, flush=True)
+
+    print(f"Слежу за: {', '.join(d['path'] for d in cfg['dirs'])}", file=sys.stderr, flush=True)
+    try:
+        stats = watch(cfg, max_workers=args.jobs, log_dir=args.log_dir, schedule=args.schedule,
+                      on_result=report, on_report=show_stats, metrics_path=None if args.no_metrics else METRICS_LOG)
+    except KeyboardInterrupt:
+        print("Остановлено; незавершённые задания остались в очереди (batch.py --resume)", file=sys.stderr)
+        return 0
+    show_stats(stats.line(JobQueue().counts(owner=JOB_OWNER), 0))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
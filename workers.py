@@ -0,0 +1,838 @@
+import os
+import sys
+import time
+import signal
+import functools
+import threading
+import contextlib
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+
+# ./ffmpeg/ffmpeg.exe
+# ./ffmpeg/ffprobe.exe
+# ./saves/
+
+ROOT = Path(__file__).parent
+FFMPEG_DIR = ROOT / "ffmpeg"
+if getattr(sys, 'frozen', False):
+    ROOT = Path(sys.executable).parent
+else:
+    ROOT = Path(__file__).parent
+# created by the first job that writes there (unique_path), not on import
+SAVES_DIR = ROOT / "saves"
+CACHE_DIR = ROOT / "cache"
+
+if (FFMPEG_DIR / "ffmpeg.exe").exists() or (FFMPEG_DIR / "ffmpeg").exists():
+    if (FFMPEG_DIR / "ffmpeg.exe").exists():
+        FFMPEG_BIN = str(FFMPEG_DIR / "ffmpeg.exe")
+    else:
+        FFMPEG_BIN = str(FFMPEG_DIR / "ffmpeg")
+else:
+    FFMPEG_BIN = "ffmpeg"
+
+if (FFMPEG_DIR / "ffprobe.exe").exists() or (FFMPEG_DIR / "ffprobe").exists():
+    if (FFMPEG_DIR / "ffprobe.exe").exists():
+        FFPROBE_BIN = str(FFMPEG_DIR / "ffprobe.exe")
+    else:
+        FFPROBE_BIN = str(FFMPEG_DIR / "ffprobe")
+else:
+    FFPROBE_BIN = "ffprobe"
+
+if (FFMPEG_DIR / "ffplay.exe").exists():
+    FFPLAY_BIN = str(FFMPEG_DIR / "ffplay.exe")
+elif (FFMPEG_DIR / "ffplay").exists():
+    FFPLAY_BIN = str(FFMPEG_DIR / "ffplay")
+else:
+    FFPLAY_BIN = "ffplay"
+
+IMG_EXTS = {'.png', '.jpg', '.jpeg', '.webp', '.bmp', '.tiff', '.gif'}
+# extra args for pass 1 of compress_precise. x264 refuses a stats file whose
+# bframes/b-pyramid differ from pass 2, so those are pinned to the medium values
+FIRST_PASS_PROFILES = {
+    'default': [],
+    'fast': ['-preset', 'veryfast', '-x264-params', 'bframes=3:b-pyramid=normal:weightp=2'],
+}
+SOUND_CODECS = {'mp3': 'libmp3lame', 'wav': 'pcm_s16le', 'flac': 'flac', 'aac': 'aac', 'm4a': 'aac', 'ogg': 'libvorbis'}
+# taken when the ffmpeg build lacks the first choice (see caps.py)
+ENCODER_FALLBACKS = {'libmp3lame': ('libshine',), 'libvorbis': ('libopus',)}
+# run_subprocess refuses a command the build can't run, without launching it
+UNSUPPORTED_RC = 2
+
+
+def partial_path(dest: Path) -> Path:
+    # ffmpeg writes here; renamed to dest only after a clean exit
+    return dest.with_name(f".{dest.stem}.part{dest.suffix}")
+
+
+def _reserve(dest: Path) -> bool:
+    # the empty partial file claims the name: concurrent jobs with the same
+    # output name can't both get it. ffmpeg -y overwrites the placeholder
+    if dest.exists():
+        return False
+    try:
+        open(partial_path(dest), 'x').close()
+    except FileExistsError:
+        return False
+    return True
+
+
+def unique_path(dest: Path) -> Path:
+    # a free name whose partial file is already created; finish_job renames or removes it
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if _reserve(dest):
+        return dest
+    stem = dest.stem
+    suffix = dest.suffix
+    i = 1
+    while True:
+        candidate = dest.with_name(f"{stem}_{i}{suffix}")
+        if _reserve(candidate):
+            return candidate
+        i += 1
+
+
+PROGRESS_KEYS = {'frame', 'fps', 'bitrate', 'total_size', 'out_time_us', 'out_time_ms', 'out_time',
+                 'dup_frames', 'drop_frames', 'speed', 'progress', 'stream_0_0_q'}
+
+
+def _to_float(value):
+    try:
+        return float(str(value).rstrip('x'))
+    except (TypeError, ValueError):
+        return None
+
+
+def progress_event(state, duration=None):
+    # -progress block -> {frame, fps, speed, out_time, total_size, percent, eta, done}
+    out_us = _to_float(state.get('out_time_us')) or _to_float(state.get('out_time_ms'))
+    out_time = out_us / 1_000_000 if out_us and out_us > 0 else 0.0
+    speed = _to_float(state.get('speed'))
+    ev = {
+        'frame': int(_to_float(state.get('frame')) or 0),
+        'fps': _to_float(state.get('fps')),
+        'speed': speed,
+        'out_time': out_time,
+        'total_size': int(_to_float(state.get('total_size')) or 0),
+        'percent': None,
+        'eta': None,
+        'done': state.get('progress') == 'end',
+    }
+    if duration:
+        ev['percent'] = 100.0 if ev['done'] else min(out_time / duration * 100, 100.0)
+        if speed:
+            ev['eta'] = max(duration - out_time, 0.0) / speed
+    return ev
+
+
+_local = threading.local()
+
+
+def _set_affinity(pid, cpus):
+    # every thread of the process, not only the main one
+    try:
+        tids = [int(t) for t in os.listdir(f"/proc/{pid}/task")]
+    except OSError:
+        tids = [pid]
+    for tid in tids:
+        try:
+            os.sched_setaffinity(tid, cpus)
+        except OSError:
+            pass
+
+
+class JobLimits:
+    # resources the scheduler gave one job; applied to every ffmpeg the job starts
+    def __init__(self, cpus=None, threads=None, nice=0):
+        self.cpus = cpus
+        self.threads = threads
+        self.nice = nice
+        self.pids = set()
+        self.suspended = False
+        self._lock = threading.Lock()
+
+    def attach(self, pid):
+        if self.cpus and hasattr(os, 'sched_setaffinity'):
+            _set_affinity(pid, self.cpus)
+        if self.nice and hasattr(os, 'setpriority'):
+            try:
+                os.setpriority(os.PRIO_PROCESS, pid, self.nice)
+            except OSError:
+                pass
+        with self._lock:
+            self.pids.add(pid)
+            if self.suspended:
+                self._signal(pid, 'SIGSTOP')
+
+    def detach(self, pid):
+        with self._lock:
+            self.pids.discard(pid)
+
+    def _signal(self, pid, name):
+        sig = getattr(signal, name, None)
+        if sig is None:
+            return
+        try:
+            os.kill(pid, sig)
+        except OSError:
+            pass
+
+    def suspend(self):
+        with self._lock:
+            self.suspended = True
+            for pid in self.pids:
+                self._signal(pid, 'SIGSTOP')
+
+    def resume(self, cpus=None):
+        # may continue on other cores than it was paused on
+        with self._lock:
+            if cpus:
+                self.cpus = cpus
+            self.suspended = False
+            for pid in self.pids:
+                if cpus and hasattr(os, 'sched_setaffinity'):
+                    _set_affinity(pid, cpus)
+                self._signal(pid, 'SIGCONT')
+
+
+def current_limits():
+    return getattr(_local, 'limits', None)
+
+
+@contextlib.contextmanager
+def use_limits(limits):
+    prev = current_limits()
+    _local.limits = limits
+    try:
+        yield limits
+    finally:
+        _local.limits = prev
+
+
+class JobMetrics:
+    # what the ffmpeg processes of one job cost; run_subprocess adds every process
+    def __init__(self):
+        self.processes = 0
+        self.cpu_user = 0.0
+        self.cpu_system = 0.0
+        self.peak_rss = 0
+        self.frames = 0
+        self.fps = None
+        self.speed = None
+        self._longest = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, wall, usage=None, event=None):
+        with self._lock:
+            self.processes += 1
+            if usage is not None:
+                self.cpu_user += usage.ru_utime
+                self.cpu_system += usage.ru_stime
+                # kilobytes on Linux, bytes on macOS
+                rss = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+                self.peak_rss = max(self.peak_rss, rss)
+            if event:
+                self.frames += event['frame']
+                # encode fps/speed of the process that took longest: the actual encode,
+                # not the probe or the remux around it
+                if wall >= self._longest and event['fps']:
+                    self._longest = wall
+                    self.fps = event['fps']
+                    self.speed = event['speed']
+
+    def as_dict(self):
+        with self._lock:
+            return {'processes': self.processes, 'cpu_user': round(self.cpu_user, 3),
+                    'cpu_system': round(self.cpu_system, 3), 'peak_rss': self.peak_rss,
+                    'frames': self.frames, 'fps': self.fps, 'speed': self.speed}
+
+
+def current_metrics():
+    return getattr(_local, 'metrics', None)
+
+
+@contextlib.contextmanager
+def use_metrics(metrics):
+    prev = current_metrics()
+    _local.metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _local.metrics = prev
+
+
+def _wait(p, with_usage):
+    # -> rusage of the child, or None where wait4 doesn't exist
+    if not with_usage or not hasattr(os, 'wait4'):
+        p.wait()
+        return None
+    _, status, usage = os.wait4(p.pid, 0)
+    p.returncode = os.waitstatus_to_exitcode(status)
+    return usage
+
+
+# ffmpeg options that take no value; everything else after the inputs is
+# "-option value" or an output path
+FLAG_OPTIONS = {'-y', '-n', '-an', '-vn', '-sn', '-dn', '-shortest', '-nostdin', '-nostats', '-hide_banner',
+                '-copyts', '-noaccurate_seek', '-stats'}
+
+
+def output_positions(cmd):
+    # indexes of the output paths in an ffmpeg command line
+    inputs = [i for i, a in enumerate(cmd) if a == '-i']
+    if not inputs:
+        return []
+    positions = []
+    i = inputs[-1] + 2
+    while i < len(cmd):
+        a = cmd[i]
+        if a.startswith('-') and len(a) > 1:
+            i += 1 if a.split(':', 1)[0] in FLAG_OPTIONS else 2
+        else:
+            positions.append(i)
+            i += 1
+    return positions
+
+
+def with_threads(cmd, threads):
+    # -threads is per file: in front of an -i it only limits that input's decoder,
+    # so it goes in front of every output for the encoders; -filter_threads is global
+    cmd = list(cmd)
+    for pos in reversed(output_positions(cmd)):
+        cmd[pos:pos] = ['-threads', str(threads)]
+    return [cmd[0], '-filter_threads', str(threads)] + cmd[1:]
+
+
+def run_subprocess(cmd, write_log=None, on_progress=None, duration=None, stdout=None, threads=None):
+    # threads: this process's share when a job runs several encoders at once
+    limits = current_limits()
+    metrics = current_metrics()
+    threads = threads or (limits.threads if limits else None)
+    if threads:
+        cmd = with_threads(cmd, threads)
+    track = on_progress or metrics
+    if track:
+        # machine-readable key=value blocks on stdout instead of the stats line
+        # (on stderr when stdout carries the media itself, see stream.py)
+        cmd = [cmd[0], '-progress', 'pipe:1' if stdout is None else 'pipe:2', '-nostats'] + list(cmd[1:])
+    if cmd[0] == FFMPEG_BIN:
+        from caps import unsupported
+        lacking = unsupported(cmd)
+        if lacking:
+            if write_log:
+                write_log(f"Эта сборка ffmpeg не поддерживает: {', '.join(lacking)}")
+            return UNSUPPORTED_RC
+    started = time.monotonic()
+    if stdout is None:
+        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, shell=False)
+        lines = p.stdout
+    else:
+        p = subprocess.Popen(cmd, stdout=stdout, stderr=subprocess.PIPE, text=True, shell=False)
+        lines = p.stderr
+    if limits:
+        limits.attach(p.pid)
+    state = {}
+    event = None
+    for line in lines:
+        if track:
+            key, sep, value = line.strip().partition('=')
+            if sep and key in PROGRESS_KEYS:
+                state[key] = value.strip()
+                if key == 'progress':
+                    event = progress_event(state, duration)
+                    if on_progress:
+                        on_progress(event)
+                continue
+        if write_log:
+            write_log(line)
+    usage = _wait(p, metrics is not None)
+    if limits:
+        limits.detach(p.pid)
+    if metrics:
+        metrics.add(time.monotonic() - started, usage, event)
+    return p.returncode
+
+
+def choose_encoder(name, write_log=None):
+    # name, or a fallback the build does have, or None
+    from caps import pick_encoder
+    chosen = pick_encoder(name, *ENCODER_FALLBACKS.get(name, ()))
+    if write_log and chosen and chosen != name:
+        write_log(f"В этой сборке ffmpeg нет {name} — используем {chosen}")
+    return chosen
+
+
+def check_build(write_log, encoders=(), filters=()):
+    # reject a job before any probing or encoding when the build can't do it
+    from caps import missing
+    lacking = missing(encoders, filters)
+    if lacking:
+        write_log(f"Эта сборка ffmpeg не поддерживает: {', '.join(lacking)} — задание отклонено")
+        return False
+    return True
+
+
+def ffprobe_duration(path):
+    from probe import probe_media
+    info = probe_media(path)
+    return info['duration'] if info else None
+
+
+def result_cached(kind):
+    # identical input + settings -> reuse the earlier output (see results.py)
+    def deco(func):
+        @functools.wraps(func)
+        def wrapper(input_path, *args, use_cache=True, **kwargs):
+            if not use_cache:
+                return func(input_path, *args, **kwargs)
+            from results import run_cached
+            return run_cached(kind, func, input_path, args, kwargs)
+        # callers check this before passing use_cache (the signature shows the wrapped function)
+        wrapper.result_cache_kind = kind
+        return wrapper
+    return deco
+
+
+def noop_log(text):
+    pass
+
+
+def finish_job(rc, out_path, write_log, fail_msg):
+    # every job reports (exit code, output path or None); the partial file
+    # only becomes out_path when ffmpeg exited cleanly
+    part = partial_path(out_path)
+    if rc == 0 and part.exists():
+        os.replace(part, out_path)
+        write_log(f"Готово: {out_path}")
+        return (0, out_path)
+    try:
+        part.unlink()
+    except OSError:
+        pass
+    write_log(fail_msg)
+    return (rc or 1, None)
+
+
+def video_bitrate_for_size(size_mb, audio_kbit, duration, write_log=None, correction=1.0):
+    # correction: learned actual/target ratio for this kind of output (sizestats.py)
+    write_log = write_log or noop_log
+    target_bytes = size_mb * 1024 * 1024 / correction
+    audio_bps = audio_kbit * 1000
+    total_bps = (target_bytes * 8) / duration
+    video_bps = total_bps - audio_bps
+    if video_bps < 10000:
+        write_log("Рассчитанный видеобитрейт слишком мал — уменьшите аудио-битрейт или увеличьте размер файла")
+        video_bps = max(int(total_bps * 0.9), 10000)
+    return int(video_bps)
+
+
+# the re-encode after an overshoot aims this much under the cap
+CAP_SAFETY = 0.97
+
+
+def size_correction(method, container, write_log=None):
+    from sizestats import correction
+    factor = correction(method, container, 'libx264')
+    if write_log and abs(factor - 1.0) > 0.005:
+        write_log(f"Поправка по прошлым результатам ({container.lstrip('.')}, {method}): x{1 / factor:.3f} к целевому размеру")
+    return factor
+
+
+def reencode_inputs(inp, audio_from):
+    # -> (input args, audio args or None). With audio_from the video comes from the
+    # source and the already encoded audio is copied from the first attempt
+    if audio_from is None:
+        return ['-i', str(inp)], None
+    return ['-i', str(inp), '-i', str(audio_from), '-map', '0:v:0', '-map', '1:a?'], ['-c:a', 'copy']
+
+
+def enforce_size_cap(result, size_mb, correction, audio_kbit, duration, video_bps, method, redo, write_log):
+    # record target vs actual; over the cap -> one more video-only encode with the
+    # bitrate cut by the measured overshoot. redo(video_bps, dest, audio_from) -> rc
+    rc, out_path = result
+    if rc != 0 or not out_path:
+        return result
+    from sizestats import record
+    cap = size_mb * 1024 * 1024
+    actual = out_path.stat().st_size
+    # against what the encoder was aimed at, so the stored ratio is the raw drift
+    record(method, out_path.suffix, 'libx264', cap / correction, actual)
+    if actual <= cap:
+        return result
+
+    audio_bytes = audio_kbit * 1000 / 8 * duration
+    video_actual = max(actual - audio_bytes, 1)
+    new_bps = max(int(video_bps * max(cap - audio_bytes, 1) / video_actual * CAP_SAFETY), 10000)
+    write_log(f"Файл больше лимита ({actual / 1024 ** 2:.2f} > {size_mb} MB) — перекодируем только видео, video_bitrate={new_bps}")
+    first = out_path.with_name(f".{out_path.stem}.first{out_path.suffix}")
+    os.replace(out_path, first)
+    part = partial_path(out_path)
+    rc = redo(new_bps, part, first)
+    if rc == 0 and part.exists():
+        os.replace(part, out_path)
+        first.unlink()
+        size = out_path.stat().st_size
+        if size > cap:
+            write_log(f"Всё ещё больше лимита: {size / 1024 ** 2:.2f} MB")
+        else:
+            write_log(f"Готово: {out_path} ({size / 1024 ** 2:.2f} MB)")
+        return (0, out_path)
+    try:
+        part.unlink()
+    except OSError:
+        pass
+    os.replace(first, out_path)
+    write_log("Повторное кодирование не удалось — оставлен первый результат (больше лимита)")
+    return result
+
+
+# below this many bits per pixel x264 output turns to mush; the frame is scaled
+# down the ladder (and the frame rate lowered) until the bitrate covers it
+MIN_BPP = 0.04
+HEIGHT_LADDER = (2160, 1440, 1080, 720, 540, 480, 360, 240)
+MAX_SMOOTH_FPS = 30
+LOW_FPS = 15
+
+
+def _even(x):
+    return max(2, int(round(x / 2)) * 2)
+
+
+def fit_resolution(video_bps, width, height, fps=None):
+    # -> (width, height, fps) the bitrate can carry, None when the source already fits.
+    # The ladder runs on the short side, so portrait video is handled the same way
+    fps = fps or 25.0
+    short = min(width, height)
+
+    def bpp(side, f):
+        k = side / short
+        return video_bps / (width * k * height * k * f)
+
+    if bpp(short, fps) >= MIN_BPP:
+        return None
+    rungs = [short] + [h for h in HEIGHT_LADDER if h < short]
+    f = fps
+    for side in rungs:
+        # 50/60 fps goes down to 30 before the picture gets smaller
+        if f > MAX_SMOOTH_FPS and bpp(side, f) < MIN_BPP:
+            f = MAX_SMOOTH_FPS
+        if bpp(side, f) >= MIN_BPP:
+            break
+    else:
+        side, f = rungs[-1], min(f, LOW_FPS)
+    k = side / short
+    return _even(width * k), _even(height * k), f
+
+
+def fit_video_filters(inp, video_bps, write_log=None):
+    # ['-vf', 'scale=..,fps=..'] for a bitrate too low for the source, else []
+    write_log = write_log or noop_log
+    from probe import probe_media
+    info = probe_media(inp)
+    video = info.get('video') if info else None
+    if not video or not video.get('width') or not video.get('height'):
+        return []
+    fps = video.get('fps')
+    fit = fit_resolution(video_bps, video['width'], video['height'], fps)
+    if not fit:
+        return []
+    w, h, f = fit
+    filters = []
+    if (w, h) != (video['width'], video['height']):
+        # relative to the frames the filter gets: ffmpeg has already applied the
+        # rotation metadata, so a portrait phone clip arrives with iw/ih swapped
+        k = f"{min(w, h)}/{min(video['width'], video['height'])}"
+        filters.append(f"scale=round(iw*{k}/2)*2:round(ih*{k}/2)*2")
+    if fps and f < fps:
+        filters.append(f"fps={f:g}")
+    if not filters:
+        return []
+    write_log(f"Битрейт мал для {video['width']}x{video['height']}@{fps or 0:.3g} — кодируем в {w}x{h}@{f:.3g}")
+    return ['-vf', ','.join(filters)]
+
+
+# named equalizer settings (watch-folder rules refer to them by name)
+EQ_PRESETS = {
+    'flat': {'speed': 1.0, 'bass': 0, 'treble': 0, 'gain': 0},
+    'bass_boost': {'bass': 8, 'treble': 0, 'gain': -2},
+    'voice': {'bass': -4, 'treble': 4, 'gain': 2},
+    'bright': {'bass': 0, 'treble': 6, 'gain': 0},
+    'loud': {'bass': 2, 'treble': 2, 'gain': 6},
+}
+
+
+# EBU R128 target for normalize: -16 LUFS integrated, -1.5 dBTP (podcast/streaming level)
+LOUDNORM_TARGET = {'I': -16.0, 'TP': -1.5, 'LRA': 11.0}
+
+
+def loudnorm_filters(measured, target=LOUDNORM_TARGET, sample_rate=None):
+    # second loudnorm stage with the stored measurement: a plain gain (linear mode)
+    # unless that would break the true-peak limit; loudnorm outputs 192 kHz, resample back
+    ln = (f"loudnorm=I={target['I']}:TP={target['TP']}:LRA={target['LRA']}"
+          f":measured_I={measured['input_i']}:measured_TP={measured['input_tp']}"
+          f":measured_LRA={measured['input_lra']}:measured_thresh={measured['input_thresh']}"
+          f":offset={measured['target_offset']}:linear=true")
+    return [ln, f"aresample={sample_rate or 48000}"]
+
+
+def sound_filters(speed=1.0, bass=0, treble=0, gain=0):
+    af_parts = []
+
+    if abs(speed - 1.0) > 1e-6:
+        factors = []
+        val = speed
+        while val < 0.5:
+            factors.append(0.5)
+            val /= 0.5
+        while val > 2.0:
+            factors.append(2.0)
+            val /= 2.0
+        factors.append(val)
+        af_parts.extend([f"atempo={f:.6g}" for f in factors if f > 0])
+
+    if bass != 0:
+        af_parts.append(f"equalizer=f=100:width_type=h:width=200:g={bass}")
+
+    if treble != 0:
+        af_parts.append(f"equalizer=f=6000:width_type=h:width=2000:g={treble}")
+
+    if gain != 0:
+        af_parts.append(f"volume={gain}dB")
+
+    return af_parts
+
+
+@result_cached('convert')
+def convert(input_path, ext, segmented=False, write_log=None, on_progress=None):
+    write_log = write_log or noop_log
+    inp = Path(input_path)
+    if not inp.exists():
+        write_log(f"Файл не найден: {input_path}")
+        return (2, None)
+    ext = ext.strip().lstrip('.')
+    out_name = inp.stem + '.' + ext
+    out_path = SAVES_DIR / out_name
+    out_path = unique_path(out_path)
+    part = partial_path(out_path)
+
+    plan = None
+    if inp.suffix.lower() not in IMG_EXTS:
+        from probe import probe_media
+        from compat import plan_streams
+        info = probe_media(inp)
+        plan = plan_streams(info, ext)
+
+    if plan is not None:
+        # copy/encode decision per stream is made up front from the probe,
+        # so nothing is spent on a remux that is bound to fail
+        rc = _run_stream_plan(inp, part, ext, plan, info, segmented, write_log, on_progress)
+        if rc == 0 and part.exists():
+            return finish_job(rc, out_path, write_log, "")
+        write_log("Выборочное копирование не сработало — выполняем перекодировку (libx264/aac)")
+    else:
+        cmd_copy = [FFMPEG_BIN, '-y', '-i', str(inp), '-c', 'copy', str(part)]
+        write_log(f"Попытка копирования потоков: {' '.join(cmd_copy)}")
+        rc = run_subprocess(cmd_copy, write_log=write_log)
+        if rc == 0 and part.exists():
+            return finish_job(rc, out_path, write_log, "")
+
+        write_log("Копирование не сработало — выполняем перекодировку (libx264/aac)")
+    if inp.suffix.lower() in IMG_EXTS:
+        cmd_img = [FFMPEG_BIN, '-y', '-i', str(inp), str(part)]
+        write_log(f"Команда: {' '.join(cmd_img)}")
+        rc = run_subprocess(cmd_img, write_log=write_log)
+    else:
+        video_args = ['-c:v', 'libx264', '-preset', 'medium', '-crf', '23']
+        audio_args = ['-c:a', 'aac', '-b:a', '128k']
+        duration = ffprobe_duration(inp)
+        if segmented and duration:
+            from segments import encode_segmented
+            rc = encode_segmented(inp, part, duration, video_args, audio_args, write_log)
+        else:
+            cmd_enc = [FFMPEG_BIN, '-y', '-i', str(inp)] + video_args + audio_args + [str(part)]
+            write_log(f"Команда: {' '.join(cmd_enc)}")
+            rc = run_subprocess(cmd_enc, write_log=write_log, on_progress=on_progress, duration=duration)
+
+    return finish_job(rc, out_path, write_log, "Что-то пошло не так — выходной файл не найден")
+
+
+def _run_stream_plan(inp, out_path, ext, plan, info, segmented, write_log, on_progress=None):
+    from compat import plan_args, encoder_args, describe_plan
+    for line in describe_plan(plan, info):
+        write_log(line)
+
+    kinds = [kind for _, kind, _, _ in plan]
+    actions = {kind: action for _, kind, action, _ in plan}
+    # chunked mode handles one video + at most one audio stream and nothing else:
+    # its concat step would drop the subtitles the plan copies
+    single = kinds.count('video') == 1 and kinds.count('audio') <= 1 and len(kinds) == kinds.count('video') + kinds.count('audio')
+    if segmented and actions.get('video') == 'encode' and single and info.get('duration'):
+        from segments import encode_segmented
+        audio_args = ['-c:a', 'copy'] if actions.get('audio') == 'copy' else encoder_args('audio', ext)
+        return encode_segmented(inp, out_path, info['duration'], encoder_args('video', ext), audio_args, write_log)
+
+    cmd = [FFMPEG_BIN, '-y', '-i', str(inp)] + plan_args(plan) + [str(out_path)]
+    write_log(f"Команда: {' '.join(cmd)}")
+    return run_subprocess(cmd, write_log=write_log, on_progress=on_progress, duration=info.get('duration'))
+
+
+@result_cached('compress_precise')
+def compress_precise(input_path, size_mb, audio_kbit=128, first_pass='fast', auto_scale=True, write_log=None, on_progress=None):
+    write_log = write_log or noop_log
+    inp = Path(input_path)
+    if not inp.exists():
+        write_log(f"Файл не найден: {input_path}")
+        return (2, None)
+    if not check_build(write_log, encoders=('libx264', 'aac')):
+        return (2, None)
+
+    duration = ffprobe_duration(inp)
+    if not duration or duration <= 0:
+        write_log("Не удалось получить длительность видео (ffprobe)")
+        return (1, None)
+
+    correction = size_correction('precise', inp.suffix, write_log)
+    video_bitrate = str(video_bitrate_for_size(size_mb, audio_kbit, duration, write_log, correction))
+    audio_bitrate = f"{audio_kbit}k"
+
+    out_name = inp.stem + f"_compressed_precise{inp.suffix}"
+    out_path = SAVES_DIR / out_name
+    out_path = unique_path(out_path)
+    part = partial_path(out_path)
+
+    write_log(f"Длительность: {duration:.2f} s")
+    write_log(f"Целевой размер: {size_mb} MB -> video_bitrate={video_bitrate} bps, audio={audio_bitrate}")
+
+    null_dev = "NUL" if os.name == 'nt' else "/dev/null"
+    first_pass_args = FIRST_PASS_PROFILES.get(first_pass, [])
+    # both passes must see the same frames
+    scale_args = fit_video_filters(inp, int(video_bitrate), write_log) if auto_scale else []
+
+    def encode(video_bps, dest, audio_from=None):
+        # own passlog per job, so several precise compressions can run at once
+        pass_dir = tempfile.mkdtemp(prefix='vcc_pass_')
+        passlog = str(Path(pass_dir) / 'pass')
+        inputs, audio_args = reencode_inputs(inp, audio_from)
+        try:
+            cmd1 = [FFMPEG_BIN, '-y', '-i', str(inp)] + scale_args + ['-c:v', 'libx264', '-b:v', str(video_bps)] + first_pass_args + ['-pass', '1', '-passlogfile', passlog, '-an', '-sn', '-dn', '-f', 'null', null_dev]
+            write_log(f"Первый проход: {' '.join(cmd1)}")
+            rc1 = run_subprocess(cmd1, write_log=write_log, on_progress=on_progress, duration=duration)
+            if rc1 != 0:
+                write_log("Первый проход вернул код != 0, но продолжаем вторым проходом (возможно предупреждения)")
+
+            cmd2 = [FFMPEG_BIN, '-y'] + inputs + scale_args + ['-c:v', 'libx264', '-b:v', str(video_bps), '-pass', '2', '-passlogfile', passlog] + (audio_args or ['-c:a', 'aac', '-b:a', audio_bitrate]) + [str(dest)]
+            write_log(f"Второй проход: {' '.join(cmd2)}")
+            return run_subprocess(cmd2, write_log=write_log, on_progress=on_progress, duration=duration)
+        finally:
+            shutil.rmtree(pass_dir, ignore_errors=True)
+
+    rc2 = encode(video_bitrate, part)
+    result = finish_job(rc2, out_path, write_log, "Не удалось создать выходной файл.")
+    return enforce_size_cap(result, size_mb, correction, audio_kbit, duration, int(video_bitrate), 'precise', encode, write_log)
+
+
+@result_cached('compress_fast')
+def compress_fast(input_path, size_mb, audio_kbit=128, segmented=False, auto_scale=True, write_log=None, on_progress=None):
+    write_log = write_log or noop_log
+    inp = Path(input_path)
+    if not inp.exists():
+        write_log(f"Файл не найден: {input_path}")
+        return (2, None)
+    if not check_build(write_log, encoders=('libx264', 'aac')):
+        return (2, None)
+
+    duration = ffprobe_duration(inp)
+    if not duration or duration <= 0:
+        write_log("Не удалось получить длительность видео (ffprobe)")
+        return (1, None)
+
+    correction = size_correction('fast', inp.suffix, write_log)
+    video_bitrate = str(video_bitrate_for_size(size_mb, audio_kbit, duration, write_log, correction))
+    audio_bitrate = f"{audio_kbit}k"
+
+    out_name = inp.stem + f"_compressed_fast{inp.suffix}"
+    out_path = SAVES_DIR / out_name
+    out_path = unique_path(out_path)
+    part = partial_path(out_path)
+
+    write_log(f"Длительность: {duration:.2f} s")
+    write_log(f"Целевой размер: {size_mb} MB -> video_bitrate={video_bitrate} bps, audio={audio_bitrate}")
+
+    scale_args = fit_video_filters(inp, int(video_bitrate), write_log) if auto_scale else []
+    audio_args = ['-c:a', 'aac', '-b:a', audio_bitrate]
+
+    def encode(video_bps, dest, audio_from=None):
+        video_args = scale_args + ['-c:v', 'libx264', '-b:v', str(video_bps), '-preset', 'fast']
+        if segmented and audio_from is None:
+            # every chunk gets the same average bitrate, so chunk budgets add up to the target
+            from segments import encode_segmented
+            return encode_segmented(inp, dest, duration, video_args, audio_args, write_log)
+        inputs, copy_audio = reencode_inputs(inp, audio_from)
+        cmd = [FFMPEG_BIN, '-y'] + inputs + video_args + (copy_audio or audio_args) + [str(dest)]
+        write_log(f"Команда (быстрое): {' '.join(cmd)}")
+        return run_subprocess(cmd, write_log=write_log, on_progress=on_progress, duration=duration)
+
+    rc = encode(video_bitrate, part)
+    result = finish_job(rc, out_path, write_log, "Не удалось создать выходной файл")
+    return enforce_size_cap(result, size_mb, correction, audio_kbit, duration, int(video_bitrate), 'fast', encode, write_log)
+
+
+@result_cached('sound')
+def process_sound(input_path, ext, speed=1.0, bass=0, treble=0, gain=0, bitrate=192, normalize=False,
+                  write_log=None, on_progress=None):
+    write_log = write_log or noop_log
+    inp = Path(input_path)
+    if not inp.exists():
+        write_log(f"Файл не найден: {input_path}")
+        return (2, None)
+
+    ext = ext.strip().lstrip('.').lower()
+    codec = SOUND_CODECS.get(ext, 'copy')
+    if codec != 'copy':
+        codec = choose_encoder(codec, write_log)
+        if codec is None:
+            write_log(f"Эта сборка ffmpeg не умеет кодировать {ext} — задание отклонено")
+            return (2, None)
+    from caps import filter_names
+    if not check_build(write_log, filters=filter_names(','.join(sound_filters(speed, bass, treble, gain)))
+                       + (['loudnorm'] if normalize else [])):
+        return (2, None)
+    out_name = inp.stem + f"_sound.{ext}"
+    out_path = SAVES_DIR / out_name
+    out_path = unique_path(out_path)
+    part = partial_path(out_path)
+
+    af_parts = sound_filters(speed, bass, treble, gain)
+    if normalize:
+        # normalized first, so bass/treble/gain stay relative to the target level
+        from probe import probe_media, measure_loudness
+        measured = measure_loudness(inp)
+        if measured:
+            info = probe_media(inp)
+            rate = (info.get('audio') or {}).get('sample_rate') if info else None
+            write_log(f"Громкость: {measured['input_i']:.1f} LUFS, пик {measured['input_tp']:.1f} dBTP -> {LOUDNORM_TARGET['I']:g} LUFS")
+            af_parts = loudnorm_filters(measured, sample_rate=rate) + af_parts
+        else:
+            write_log("Не удалось измерить громкость — нормализация пропущена")
+
+    cmd = [FFMPEG_BIN, '-y', '-i', str(inp)]
+    if af_parts:
+        af_filter = ','.join(af_parts)
+        cmd += ['-af', af_filter]
+
+    if codec != 'copy':
+        cmd += ['-c:a', codec]
+        cmd += ['-b:a', f"{bitrate}k"]
+    else:
+        cmd += ['-c', 'copy']
+
+    cmd.append(str(part))
+
+    write_log(f"Команда (эквалайзер): {' '.join(cmd)}")
+    duration = ffprobe_duration(inp) if on_progress else None
+    if duration and speed > 0:
+        duration /= speed
+    rc = run_subprocess(cmd, write_log=write_log, on_progress=on_progress, duration=duration)
+
+    return finish_job(rc, out_path, write_log, "Не удалось создать аудиофайл")